@@ -3,8 +3,13 @@ import random
 from sqlalchemy import event
 from sqladmin import Admin, ModelView
 from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from app.db.session import engine_writer, get_read_session, get_write_session
+from sqlalchemy.orm import selectinload, sessionmaker
+from app.db.session import (
+    WriterSession,
+    engine_writer,
+    get_read_session,
+    get_write_session,
+)
 from app.db.models.user import User, DailyUserStats
 from app.db.models.invitation import (
     Game,
@@ -874,9 +879,14 @@ class DailyUserStatsAdmin(ModelView, model=DailyUserStats):
 
 # -------------------- Setup Admin --------------------
 def setup_admin(app):
+    # Views without their own create/update/delete write through this, so their
+    # commits invalidate cache tags too. Not the app's sessionmaker: sqladmin
+    # reconfigures the one it is given.
     admin = Admin(
         app,
-        engine_writer,
+        session_maker=sessionmaker(
+            bind=engine_writer, class_=WriterSession, expire_on_commit=False
+        ),
         title="Moyata Pokana Admin",
     )
     admin.add_view(UserAdmin)
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from app.db.session import get_write_session, get_read_session
 from app.db.models.blog import BlogPost
 from app.services.s3.presentation_image import PresentationImageService
+from app.services.media import release_media
 from app.core.permissions import is_admin_authenticated
 from app.services.helpers import slugify
 from datetime import datetime
@@ -58,16 +59,15 @@ async def handle_blog_post_upload(
         )
 
     # Handle image upload
+    old_image = None
     if image_file and image_file.filename:
-        if instance_id and getattr(instance, "image", None):
-            try:
-                await service.delete_image(instance.image)
-            except Exception as e:
-                print("Failed to delete old image:", e)
+        if instance_id:
+            old_image = getattr(instance, "image", None)
         instance.image = await service.upload_image(image_file)
 
     db.add(instance)
     await db.commit()
+    await release_media(db, [old_image])
     return instance
 
 
@@ -141,13 +141,9 @@ async def delete_blog_post(post_id: int, db: AsyncSession = Depends(get_write_se
     if not post:
         return RedirectResponse(url="/admin/blogs/", status_code=303)
 
-    service = PresentationImageService()
-    if getattr(post, "image", None):
-        try:
-            await service.delete_image(post.image)
-        except Exception as e:
-            print("Failed to delete image:", e)
+    image = getattr(post, "image", None)
 
     await db.delete(post)
     await db.commit()
+    await release_media(db, [image])
     return RedirectResponse(url="/admin/blogs/", status_code=303)
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from app.db.session import get_write_session, get_read_session
 from app.db.models.invitation import Game
 from app.services.s3.presentation_image import PresentationImageService
+from app.services.media import release_media
 from app.core.permissions import is_admin_authenticated
 
 router = APIRouter()
@@ -30,16 +31,15 @@ async def handle_game_upload(db, name: str, key: str, file: UploadFile | None, i
     else:
         instance = Game(name=name, key=key)
 
+    old_image = None
     if file and file.filename:
-        if instance_id and getattr(instance, "presentation_image", None):
-            try:
-                await service.delete_image(instance.presentation_image)
-            except Exception as e:
-                print("Failed to delete old image:", e)
+        if instance_id:
+            old_image = getattr(instance, "presentation_image", None)
         instance.presentation_image = await service.upload_image(file)
 
     db.add(instance)
     await db.commit()
+    await release_media(db, [old_image])
     return instance
 
 
@@ -101,13 +101,9 @@ async def delete_game(
     if not game:
         return RedirectResponse(url="/admin/games/", status_code=303)
 
-    service = PresentationImageService()
-    if getattr(game, "presentation_image", None):
-        try:
-            await service.delete_image(game.presentation_image)
-        except Exception as e:
-            print("Failed to delete image:", e)
+    image = getattr(game, "presentation_image", None)
 
     await db.delete(game)
     await db.commit()
+    await release_media(db, [image])
     return RedirectResponse(url="/admin/games/", status_code=303)
@@ -6,6 +6,7 @@ from sqlalchemy import select
 from app.db.session import get_write_session, get_read_session
 from app.db.models.invitation import Slideshow
 from app.services.s3.presentation_image import PresentationImageService
+from app.services.media import release_media
 from app.core.permissions import is_admin_authenticated
 
 router = APIRouter()
@@ -30,16 +31,15 @@ async def handle_slideshow_upload(db, name: str, key: str, file: UploadFile | No
     else:
         instance = Slideshow(name=name, key=key)
 
+    old_image = None
     if file and file.filename:
-        if instance_id and getattr(instance, "presentation_image", None):
-            try:
-                await service.delete_image(instance.presentation_image)
-            except Exception as e:
-                print("Failed to delete old image:", e)
+        if instance_id:
+            old_image = getattr(instance, "presentation_image", None)
         instance.presentation_image = await service.upload_image(file)
 
     db.add(instance)
     await db.commit()
+    await release_media(db, [old_image])
     return instance
 
 @router.get("/new")
@@ -96,13 +96,9 @@ async def delete_slideshow(
     if not slideshow:
         return RedirectResponse(url="/admin/slideshows/", status_code=303)
 
-    service = PresentationImageService()
-    if getattr(slideshow, "presentation_image", None):
-        try:
-            await service.delete_image(slideshow.presentation_image)
-        except Exception as e:
-            print("Failed to delete image:", e)
+    image = getattr(slideshow, "presentation_image", None)
 
     await db.delete(slideshow)
     await db.commit()
+    await release_media(db, [image])
     return RedirectResponse(url="/admin/slideshows/", status_code=303)
@@ -18,9 +18,12 @@ from app.db.models.invitation import (
     SlideshowImage,
 )
 from app.services.s3.wallpaper import WallpaperService
-from app.services.s3.music import MusicService
-from app.services.s3.slide import SlideService
+from app.services.s3.music import ALLOWED_AUDIO_TYPES, MAX_AUDIO_UPLOAD_SIZE_MB
+from app.services.s3.staging import StagingService
+from app.services.jobs import queue_job
+from app.services.s3.slide import SlideService, SlideUploadError
 from app.services.helpers import generate_template_slug
+from app.services.media import discard_uploads, release_media
 from app.core.permissions import is_admin_authenticated
 
 router = APIRouter()
@@ -28,6 +31,27 @@ jinja_templates = Jinja2Templates(directory="app/templates/admin/templates")
 
 
 # -------------------- Helpers --------------------
+async def stage_music(music: UploadFile) -> str:
+    """Store raw music for the transcoding worker, returns the staging object name."""
+    staging = StagingService()
+    return await staging.stage_upload(
+        music,
+        staging.template_staging_prefix("audio"),
+        ALLOWED_AUDIO_TYPES,
+        max_size_mb=MAX_AUDIO_UPLOAD_SIZE_MB,
+    )
+
+
+async def queue_music(template_id: int, object_name: str):
+    """Transcode staged music in a worker, which sets background_audio when done."""
+    await queue_job(
+        "invitations.tasks.process_staged_upload",
+        "audio",
+        template_id=template_id,
+        object_name=object_name,
+    )
+
+
 async def upload_file(file: UploadFile, service, old_url: str | None = None):
     if old_url:
         try:
@@ -163,20 +187,36 @@ async def create_template(
     )
 
     # Upload wallpaper and music
+    wallpaper_created = False
     if wallpaper and wallpaper.filename:
-        tpl.wallpaper = await WallpaperService().upload_wallpaper(wallpaper)
+        stored = await WallpaperService().upload_wallpaper(wallpaper)
+        tpl.wallpaper = stored.url
+        tpl.wallpaper_variants = stored.variants
+        wallpaper_created = stored.created
+    staged_music = None
     if music and music.filename:
-        tpl.background_audio = await MusicService().upload_music(music)
+        staged_music = await stage_music(music)
+
+    # Handle slides, the template is only created if all of them upload
+    try:
+        new_slides = await SlideService().upload_slides(slide_images)
+    except SlideUploadError as e:
+        await discard_uploads(
+            db,
+            [tpl.wallpaper, *e.uploaded_urls],
+            [tpl.wallpaper if wallpaper_created else None, *e.created_urls],
+        )
+        if staged_music:
+            await StagingService().discard(staged_music)
+        raise HTTPException(400, str(e))
 
     db.add(tpl)
-    await db.commit()  # commit to get tpl.id
+    await db.flush()  # flush to get tpl.id
 
-    # Handle slides
-    slide_service = SlideService()
-    for idx, f in enumerate(slide_images):
-        url = await slide_service.upload_slide(f)
+    for idx, stored in enumerate(new_slides):
         slide = SlideshowImage(
-            file_url=url,
+            file_url=stored.url,
+            variants=stored.variants,
             template_id=tpl.id,
             slideshow_id=slideshow_id,
             order=idx,
@@ -184,6 +224,8 @@ async def create_template(
         db.add(slide)
 
     await db.commit()
+    if staged_music:
+        await queue_music(tpl.id, staged_music)
     return RedirectResponse(url="/admin/templates/", status_code=303)
 
 
@@ -305,48 +347,56 @@ async def update_template(
             raise HTTPException(400, "Invalid slideshow selected")
         slideshow_id = slideshow_obj.id
 
+    # Replaced files are deleted after commit unless invitations still share them
+    replaced_urls: list[str] = []
+    # New files, released again if the slides fail to upload
+    uploaded_urls: list[str] = []
+    # The ones of them written by this request rather than deduplicated
+    created_urls: list[str] = []
+
     # Upload/update wallpaper
     if wallpaper and wallpaper.filename:
-        wallpaper_service = WallpaperService()
-        if tpl.wallpaper:
-            try:
-                await wallpaper_service.delete_wallpaper(tpl.wallpaper)
-            except Exception as e:
-                print("Failed to delete old wallpaper:", e)
-        tpl.wallpaper = await wallpaper_service.upload_wallpaper(wallpaper)
-
-    # Upload/update music
+        replaced_urls.append(tpl.wallpaper)
+        stored = await WallpaperService().upload_wallpaper(wallpaper)
+        tpl.wallpaper = stored.url
+        tpl.wallpaper_variants = stored.variants
+        uploaded_urls.append(tpl.wallpaper)
+        if stored.created:
+            created_urls.append(tpl.wallpaper)
+
+    # Stage new music, the worker replaces background_audio once transcoded
+    staged_music = None
     if music and music.filename:
-        music_service = MusicService()
-        if tpl.background_audio:
-            try:
-                await music_service.delete_music(tpl.background_audio)
-            except Exception as e:
-                print("Failed to delete old music:", e)
-        tpl.background_audio = await music_service.upload_music(music)
+        staged_music = await stage_music(music)
 
     # Handle slides
     slide_images = [f for f in (slide_images or []) if f.filename]
-    slide_service = SlideService()
     if slide_images:
         if len(slide_images) != 5:
             raise HTTPException(400, "Exactly 5 slides must be uploaded")
+        try:
+            new_slides = await SlideService().upload_slides(slide_images)
+        except SlideUploadError as e:
+            await db.rollback()
+            await discard_uploads(
+                db, uploaded_urls + e.uploaded_urls, created_urls + e.created_urls
+            )
+            if staged_music:
+                await StagingService().discard(staged_music)
+            raise HTTPException(400, str(e))
         # Delete old slides
         result = await db.execute(
             select(SlideshowImage).where(SlideshowImage.template_id == tpl.id)
         )
         old_slides = result.scalars().all()
         for old_slide in old_slides:
-            try:
-                await slide_service.delete_slide(old_slide.file_url)
-                await db.delete(old_slide)
-            except Exception as e:
-                print("Failed to delete old slide:", e)
+            replaced_urls.append(old_slide.file_url)
+            await db.delete(old_slide)
         # Add new slides
-        for idx, f in enumerate(slide_images):
-            url = await slide_service.upload_slide(f)
+        for idx, stored in enumerate(new_slides):
             slide = SlideshowImage(
-                file_url=url,
+                file_url=stored.url,
+                variants=stored.variants,
                 template_id=tpl.id,
                 slideshow_id=slideshow_id,
                 order=idx,
@@ -355,6 +405,9 @@ async def update_template(
 
     db.add(tpl)
     await db.commit()
+    await release_media(db, replaced_urls)
+    if staged_music:
+        await queue_music(tpl.id, staged_music)
     return RedirectResponse(url="/admin/templates/", status_code=303)
 
 
@@ -369,23 +422,9 @@ async def delete_template(
     if not tpl:
         return RedirectResponse(url="/admin/templates/", status_code=303)
 
-    wallpaper_service = WallpaperService()
-    music_service = MusicService()
-    slide_service = SlideService()
-
-    # Delete wallpaper
-    if tpl.wallpaper:
-        try:
-            await wallpaper_service.delete_wallpaper(tpl.wallpaper)
-        except Exception as e:
-            print("Failed to delete wallpaper:", e)
-
-    # Delete background music
-    if tpl.background_audio:
-        try:
-            await music_service.delete_music(tpl.background_audio)
-        except Exception as e:
-            print("Failed to delete music:", e)
+    # Invitations created from this template may still share its files,
+    # so they are only deleted after commit if nothing references them
+    media_urls = [tpl.wallpaper, tpl.background_audio]
 
     # Delete slides
     result = await db.execute(
@@ -393,13 +432,11 @@ async def delete_template(
     )
     slides = result.scalars().all()
     for slide in slides:
-        try:
-            await slide_service.delete_slide(slide.file_url)
-            await db.delete(slide)
-        except Exception as e:
-            print("Failed to delete slide:", e)
+        media_urls.append(slide.file_url)
+        await db.delete(slide)
 
     # Delete template itself
     await db.delete(tpl)
     await db.commit()
+    await release_media(db, media_urls)
     return RedirectResponse(url="/admin/templates/", status_code=303)
@@ -2,6 +2,7 @@ import json
 import re
 from typing import Dict, Optional
 from datetime import datetime
+from fastapi.responses import StreamingResponse
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -19,10 +20,26 @@ from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
 from sqlalchemy.exc import IntegrityError
 from app.db.session import get_write_session, get_read_session
+from app.db.consistency import current_consistency
 from app.services.s3.wallpaper import WallpaperService
-from app.services.s3.slide import SlideService
-from app.services.s3.music import MusicService
-from app.services.s3.copy import CopyService
+from app.services.s3.slide import SlideService, SlideUploadError
+from app.services.s3.music import ALLOWED_AUDIO_TYPES, MAX_AUDIO_UPLOAD_SIZE_MB
+from app.services.s3.staging import StagingService
+from app.services.s3.base import S3Base
+from app.services.jobs import get_job, queue_job
+from app.services.media import discard_uploads, release_media
+from app.services.invitation_loader import (
+    InvitationDocument,
+    load_invitation_document,
+)
+from app.services.singleflight import single_flight
+from app.services.cache import TEMPLATE_TAGS, cache
+from app.services.snapshots import (
+    get_snapshot,
+    invalidate_snapshots,
+    publish_snapshot,
+    store_snapshot,
+)
 from app.services.pagination import paginate
 from app.services.search import apply_filters_search_ordering
 from app.services.helpers import generate_google_calendar_link, generate_slug
@@ -39,6 +56,7 @@ from app.db.models.invitation import (
     Font,
     Category,
     SubCategory,
+    InvitationArchive,
 )
 from app.schemas.invitation import (
     InvitationUpdate,
@@ -53,6 +71,11 @@ from app.schemas.invitation import (
     Stats,
     FontRead,
     PaginatedResponse,
+    StagedUploadCreate,
+    StagedUploadRead,
+    StagedUploadComplete,
+    UploadJobRead,
+    InvitationArchiveRead,
 )
 from app.services.auth import get_current_user
 from http.cookies import SimpleCookie
@@ -61,43 +84,22 @@ from typing import List
 
 router = APIRouter()
 
+# Catalog and template reads, invalidated by tag when admins change them
+CATALOG_CACHE_TTL_SECONDS = 6 * 60 * 60
+
 
 # -------------------- Helper to fetch invitation with ownership --------------------
-async def fetch_invitation(
-    invitation_id: int,
-    request: Request,
-    db: AsyncSession = Depends(get_read_session),
-    current_user: dict | None = Depends(get_current_user),
-) -> Invitation:
+def authorize_invitation(
+    invitation: InvitationDocument, request: Request, current_user: dict | None
+) -> InvitationDocument:
     # Extract anon session ID from cookies
     anon_session_id = None
     cookie_header = request.headers.get("cookie")
     if cookie_header:
-        from http.cookies import SimpleCookie
-
         cookies = SimpleCookie(cookie_header)
         if "anonymous_session_id" in cookies:
             anon_session_id = cookies["anonymous_session_id"].value
 
-    # Fetch the invitation
-    result = await db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation_id)
-    )
-    invitation = result.scalars().first()
-    if not invitation:
-        raise HTTPException(status_code=404, detail="Invitation not found")
-
-    # ---------------- Access control ----------------
-
     # 1. Registered owner
     if current_user and invitation.owner_id == int(current_user.get("user_id")):
         return invitation
@@ -118,95 +120,213 @@ async def fetch_invitation(
     raise HTTPException(status_code=403, detail="Access denied")
 
 
+async def fetch_invitation(
+    invitation_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_session),
+    current_user: dict | None = Depends(get_current_user),
+) -> InvitationDocument:
+    invitation = await load_invitation_document(db, Invitation.id == invitation_id)
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    return authorize_invitation(invitation, request, current_user)
+
+
 async def fetch_invitation_by_slug(
     slug: str,
     request: Request,
     db: AsyncSession = Depends(get_read_session),
     current_user: dict | None = Depends(get_current_user),
-) -> Invitation:
-    # Extract anon session ID from cookies
-    anon_session_id = None
+) -> InvitationDocument:
+    # Published invitations come from their snapshot, Postgres is never touched
+    try:
+        invitation, version = await get_snapshot(slug)
+    except Exception as e:
+        print(f"Snapshot lookup of {slug} failed: {e}")
+        invitation, version = None, None
+
+    if invitation is None:
+
+        async def load():
+            invitation = await load_invitation_document(db, Invitation.slug == slug)
+            if invitation and version is not None:
+                try:
+                    await store_snapshot(invitation, version)
+                except Exception as e:
+                    print(f"Snapshot store of {slug} failed: {e}")
+            return invitation
+
+        consistency = current_consistency()
+        if consistency is not None and (
+            await consistency.required_lsn() or consistency.pinned
+        ):
+            # Must see its own writes: another request's (replica) read won't do
+            invitation = await load()
+        else:
+            # A shared link's first guests all miss together: one of them loads
+            invitation = await single_flight(
+                f"invitation:{slug}",
+                load,
+                encode=lambda doc: doc.to_json() if doc else "null",
+                decode=lambda raw: (
+                    None if raw == "null" else InvitationDocument.from_json(raw)
+                ),
+            )
+        if not invitation:
+            raise HTTPException(status_code=404, detail="Invitation not found")
+
+    return authorize_invitation(invitation, request, current_user)
+
+
+def request_anon_session_id(request: Request) -> str | None:
     cookie_header = request.headers.get("cookie")
     if cookie_header:
-        from http.cookies import SimpleCookie
-
         cookies = SimpleCookie(cookie_header)
         if "anonymous_session_id" in cookies:
-            anon_session_id = cookies["anonymous_session_id"].value
+            return cookies["anonymous_session_id"].value
+    return None
+
+
+def authorize_edit(
+    invitation: Invitation, request: Request, current_user: dict | None
+) -> dict:
+    """
+    Allow only the invitation's owner (registered or anonymous) to change it,
+    and not while it is live. Returns the owner, stored with the jobs it queues.
+    """
+    anon_session_id = request_anon_session_id(request)
+    if current_user and invitation.owner_id == int(current_user.get("user_id")):
+        owner = {"owner_id": invitation.owner_id}
+    elif invitation.anon_session_id and anon_session_id == invitation.anon_session_id:
+        owner = {"anon_session_id": anon_session_id}
+    else:
+        raise HTTPException(status_code=403, detail="Access denied")
 
-    # Fetch the invitation
-    result = await db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
+    now = datetime.utcnow()
+    if invitation.is_active and (
+        (invitation.active_from and invitation.active_from <= now)
+        and (invitation.active_until is None or invitation.active_until >= now)
+    ):
+        raise HTTPException(
+            status_code=403, detail="Не можете да редактирате активна покана"
         )
-        .where(Invitation.slug == slug)
+    return owner
+
+
+def owns_job(job: dict, request: Request, current_user: dict | None) -> bool:
+    if current_user and current_user.get("role") == "admin":
+        return True
+    if job.get("owner_id") is not None:
+        owner_id = int(current_user.get("user_id")) if current_user else None
+        return job["owner_id"] == owner_id
+    anon_session_id = job.get("anon_session_id")
+    return anon_session_id is not None and (
+        anon_session_id == request_anon_session_id(request)
     )
-    invitation = result.scalars().first()
-    if not invitation:
-        raise HTTPException(status_code=404, detail="Invitation not found")
-
-    # ---------------- Access control ----------------
-
-    # 1. Registered owner
-    if current_user and invitation.owner_id == int(current_user.get("user_id")):
-        return invitation
-
-    # 2. Anonymous owner
-    if invitation.anon_session_id and anon_session_id == invitation.anon_session_id:
-        if invitation.is_active:
-            raise HTTPException(
-                status_code=403, detail="Access denied"
-            )  # anon owner cannot access active
-        return invitation
 
-    # 3. Guest access (registered or anonymous, not owners)
-    if invitation.is_active:
-        return invitation
 
-    # 4. All other cases
-    raise HTTPException(status_code=403, detail="Access denied")
+# -------------------- List all games/slideshows/fonts --------------------
+async def cached_catalog(db: AsyncSession, model, schema, tag: str) -> list[dict]:
+    async def load():
+        result = await db.execute(select(model))
+        return [
+            schema.model_validate(row).model_dump(mode="json")
+            for row in result.scalars().all()
+        ]
+
+    return await cache.get_or_load(
+        tag, load, ttl=CATALOG_CACHE_TTL_SECONDS, tags=(tag,)
+    )
 
 
-# -------------------- List all games/slideshows/fonts --------------------
 @router.get("/games", response_model=list[GameRead])
 async def list_games(db: AsyncSession = Depends(get_read_session)):
-    result = await db.execute(select(Game))
-    games = result.scalars().all()
-    return games
+    return await cached_catalog(db, Game, GameRead, "catalog:games")
 
 
 @router.get("/slideshows", response_model=list[SlideshowRead])
 async def list_slideshows(db: AsyncSession = Depends(get_read_session)):
-    result = await db.execute(select(Slideshow))
-    slideshows = result.scalars().all()
-    return slideshows
+    return await cached_catalog(db, Slideshow, SlideshowRead, "catalog:slideshows")
 
 
 @router.get("/fonts", response_model=list[FontRead])
 async def list_fonts(db: AsyncSession = Depends(get_read_session)):
-    result = await db.execute(select(Font))
-    fonts = result.scalars().all()
-    return fonts
+    return await cached_catalog(db, Font, FontRead, "catalog:fonts")
+
+
+# -------------------- Archives --------------------
+# Declared before /{invitation_id} so "archives" is not parsed as an id
+@router.get("/archives", response_model=list[InvitationArchiveRead])
+async def list_archives(
+    current_user: dict | None = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Expired invitations of the current user that were moved to storage."""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    result = await db.execute(
+        select(InvitationArchive)
+        .where(InvitationArchive.owner_id == int(current_user.get("user_id")))
+        .order_by(desc(InvitationArchive.archived_at))
+    )
+    return result.scalars().all()
+
+
+@router.get("/archives/{archive_id}")
+async def download_archive(
+    archive_id: int,
+    current_user: dict | None = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_session),
+):
+    """Stream an archived invitation (row, events, RSVP, guests) as JSON."""
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+
+    archive = await db.get(InvitationArchive, archive_id)
+    if not archive:
+        raise HTTPException(status_code=404, detail="Archive not found")
+    if (
+        archive.owner_id != int(current_user.get("user_id"))
+        and current_user.get("role") != "admin"
+    ):
+        raise HTTPException(status_code=403, detail="Access denied")
+
+    # Errors while streaming would only surface after the 200 went out
+    storage = S3Base()
+    stat = await storage._stat(archive.object_name)
+    if not stat:
+        raise HTTPException(status_code=404, detail="Archive not found")
+
+    # Stored gzipped: the bytes are passed through, the client decompresses them
+    return StreamingResponse(
+        storage._stream_object(archive.object_name),
+        media_type="application/json",
+        headers={
+            "Content-Length": str(stat.size),
+            "Content-Encoding": "gzip",
+            "Content-Disposition": (
+                f'attachment; filename="invitation-{archive.invitation_id}.json"'
+            ),
+        },
+    )
 
 
 # -------------------- Get Invitation --------------------
 @router.get("/{invitation_id}", response_model=InvitationRead)
-async def get_invitation(invitation: Invitation = Depends(fetch_invitation)):
-    return invitation
+async def get_invitation(
+    invitation: InvitationDocument = Depends(fetch_invitation),
+):
+    return invitation.response()
 
 
 # ----------------- Get Invitation By Slug --------------
 @router.get("/slug/{slug}", response_model=InvitationRead)
 async def get_invitation_by_slug(
-    invitation: Invitation = Depends(fetch_invitation_by_slug),
+    request: Request,
+    invitation: InvitationDocument = Depends(fetch_invitation_by_slug),
 ):
-    return invitation
+    return invitation.response(request)
 
 
 # -------------------- Create Empty Invitation --------------------
@@ -277,27 +397,17 @@ async def create_empty_invitation(
     await write_db.refresh(invitation_obj)
 
     # -------------------- Eager-load relationships (read) --------------------
-    result = await read_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.events),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation_obj.id)
+    invitation_with_rel = await load_invitation_document(
+        read_db, Invitation.id == invitation_obj.id
     )
-    invitation_with_rel = result.scalars().first()
-    return invitation_with_rel
+    return invitation_with_rel.response()
 
 
 @router.post("/create-from-template/{template_slug}", response_model=InvitationRead)
 async def create_invitation_from_template(
     template_slug: str,
     request: Request,
-    read_db: AsyncSession = Depends(get_write_session),
+    read_db: AsyncSession = Depends(get_read_session),
     write_db: AsyncSession = Depends(get_write_session),
     current_user: dict | None = Depends(get_current_user),
     delete_old: bool = Query(False),
@@ -339,7 +449,8 @@ async def create_invitation_from_template(
         )
         & (Invitation.status == InvitationStatus.DRAFT)
     )
-    result = await read_db.execute(query)
+    # Loaded on the writer: they may be deleted below
+    result = await write_db.execute(query)
     existing_drafts = result.scalars().all()
 
     limit = 3 if current_user else 1
@@ -394,27 +505,19 @@ async def create_invitation_from_template(
     write_db.add(new_invitation)
     await write_db.flush()
 
-    # -------------------- Initialize Copy Service --------------------
-    copy_service = CopyService()
-
-    # -------------------- Duplicate wallpaper --------------------
-    if template.wallpaper:
-        new_invitation.wallpaper = await copy_service.copy_file(
-            template.wallpaper, folder="wallpapers"
-        )
-
-    # -------------------- Duplicate background audio --------------------
-    if template.background_audio:
-        new_invitation.background_audio = await copy_service.copy_file(
-            template.background_audio, folder="music"
-        )
+    # -------------------- Share template media (copy-on-write) --------------------
+    # The invitation points at the template's files; they are only replaced
+    # (never modified) when the user uploads their own, see release_media.
+    new_invitation.wallpaper = template.wallpaper
+    new_invitation.wallpaper_variants = template.wallpaper_variants
+    new_invitation.background_audio = template.background_audio
+    new_invitation.background_audio_meta = template.background_audio_meta
 
-    # -------------------- Duplicate slides --------------------
     for slide in template.slideshow_images:
-        new_file_url = await copy_service.copy_file(slide.file_url, folder="slides")
         write_db.add(
             SlideshowImage(
-                file_url=new_file_url,
+                file_url=slide.file_url,
+                variants=slide.variants,
                 invitation_id=new_invitation.id,
                 slideshow_id=slide.slideshow_id,
                 order=slide.order,
@@ -426,21 +529,11 @@ async def create_invitation_from_template(
     await write_db.refresh(new_invitation)
 
     # -------------------- Load invitation with relationships --------------------
-    result = await write_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == new_invitation.id)
+    invitation_with_rel = await load_invitation_document(
+        read_db, Invitation.id == new_invitation.id
     )
-    invitation_with_rel = result.scalars().first()
 
-    return invitation_with_rel
+    return invitation_with_rel.response()
 
 
 @router.get("/templates/{slug}", response_model=TemplateRead)
@@ -448,20 +541,38 @@ async def get_template_by_slug(
     slug: str,
     db: AsyncSession = Depends(get_read_session),
 ):
-    result = await db.execute(
-        select(Template)
-        .options(
-            selectinload(Template.slideshow_images),
-            selectinload(Template.selected_game_obj),
-            selectinload(Template.selected_slideshow_obj),
-            selectinload(Template.font_obj),
-            selectinload(Template.category),
-            selectinload(Template.subcategory),
-            selectinload(Template.subcategory_variant),
+    async def load():
+        result = await db.execute(
+            select(Template)
+            .options(
+                selectinload(Template.slideshow_images),
+                selectinload(Template.selected_game_obj),
+                selectinload(Template.selected_slideshow_obj),
+                selectinload(Template.font_obj),
+                selectinload(Template.category),
+                selectinload(Template.subcategory),
+                selectinload(Template.subcategory_variant),
+            )
+            .where(Template.slug == slug)
         )
-        .where(Template.slug == slug)
+        template = result.scalars().first()
+        return TemplateRead.model_validate(template) if template else None
+
+    template = await cache.get_or_load(
+        f"template:{slug}",
+        load,
+        ttl=CATALOG_CACHE_TTL_SECONDS,
+        # Unknown slugs are kept until any template changes
+        tags=lambda template: (
+            (f"template:{template.id}", *TEMPLATE_TAGS)
+            if template
+            else ("templates",)
+        ),
+        encode=lambda template: template.model_dump_json() if template else "null",
+        decode=lambda raw: (
+            None if raw == "null" else TemplateRead.model_validate_json(raw)
+        ),
     )
-    template = result.scalars().first()
 
     if not template:
         raise HTTPException(status_code=404, detail="Template not found")
@@ -584,6 +695,7 @@ async def update_invitation(
     invitation = await write_db.get(Invitation, invitation_id)
     if not invitation:
         raise HTTPException(status_code=404, detail="Поканата не е намерена")
+    previous_slug = invitation.slug
 
     # -------------------- FORBID EDIT ON ACTIVE --------------------
     now = datetime.utcnow()
@@ -611,6 +723,15 @@ async def update_invitation(
         },
     )
 
+    # Variants/renditions describe the uploaded files, not ones set by URL
+    if update_data.get("wallpaper", invitation.wallpaper) != invitation.wallpaper:
+        invitation.wallpaper_variants = None
+    if (
+        update_data.get("background_audio", invitation.background_audio)
+        != invitation.background_audio
+    ):
+        invitation.background_audio_meta = None
+
     for key, value in update_data.items():
         setattr(invitation, key, value)
 
@@ -660,31 +781,31 @@ async def update_invitation(
         images_result = await write_db.execute(
             select(SlideshowImage).where(SlideshowImage.invitation_id == invitation.id)
         )
+        # Slides are re-created from their URLs, keep the variants of kept files
+        variants_by_url = {}
         for img in images_result.scalars().all():
+            variants_by_url[img.file_url] = img.variants
             await write_db.delete(img)
 
         for img_data in payload.slideshow_images:
-            write_db.add(SlideshowImage(**img_data.dict(), invitation_id=invitation.id))
+            write_db.add(
+                SlideshowImage(
+                    **img_data.dict(),
+                    invitation_id=invitation.id,
+                    variants=variants_by_url.get(img_data.file_url),
+                )
+            )
 
     # Commit all writes
     await write_db.commit()
 
     # -------------------- READ PART (fresh session) --------------------
-    result = await read_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation_id)
+    invitation_with_rel = await load_invitation_document(
+        read_db, Invitation.id == invitation_id
     )
-    invitation_with_rel = result.scalars().first()
+    await publish_snapshot(invitation_with_rel, previous_slug)
 
-    return invitation_with_rel
+    return invitation_with_rel.response()
 
 
 @router.get("/", response_model=dict)
@@ -759,31 +880,15 @@ async def delete_invitation(
             status_code=403, detail="Cannot delete an active invitation"
         )
 
-    # Services for S3 cleanup
-    wallpaper_service = WallpaperService()
-    slide_service = SlideService()
-    music_service = MusicService()
-
-    # -------------------- Delete wallpaper --------------------
-    if invitation.wallpaper:
-        try:
-            await wallpaper_service._delete(invitation.wallpaper)
-        except Exception as e:
-            print(f"Failed to delete wallpaper: {e}")
-
-    # -------------------- Delete background audio --------------------
-    if invitation.background_audio:
-        try:
-            await music_service.delete_music(invitation.background_audio)
-        except Exception as e:
-            print(f"Failed to delete audio: {e}")
+    # Media is released after commit, templates and other invitations may share it
+    media_urls = [
+        invitation.wallpaper,
+        invitation.background_audio,
+        *(slide.file_url for slide in invitation.slideshow_images),
+    ]
 
     # -------------------- Delete slideshow images --------------------
     for slide in invitation.slideshow_images:
-        try:
-            await slide_service._delete(slide.file_url)
-        except Exception as e:
-            print(f"Failed to delete slide {slide.id}: {e}")
         await db.delete(slide)
 
     # -------------------- Delete events --------------------
@@ -801,8 +906,13 @@ async def delete_invitation(
         await db.delete(invitation.rsvp)
 
     # -------------------- Finally, delete the invitation itself --------------------
+    slug = invitation.slug
     await db.delete(invitation)
     await db.commit()
+    await invalidate_snapshots(slug)
+
+    # -------------------- Delete media nothing else uses --------------------
+    await release_media(db, media_urls)
     return
 
 
@@ -819,38 +929,27 @@ async def upload_invitation_wallpaper(
         raise HTTPException(status_code=404, detail="Invitation not found")
 
     wallpaper_service = WallpaperService()
-
-    # delete old wallpaper if exists
-    if invitation.wallpaper:
-        try:
-            await wallpaper_service._delete(invitation.wallpaper)
-        except Exception as e:
-            print(f"Failed to delete old wallpaper: {e}")
+    old_wallpaper = invitation.wallpaper
 
     # upload new one
-    url = await wallpaper_service.upload_wallpaper(wallpaper)
-    invitation.wallpaper = url
+    stored = await wallpaper_service.upload_wallpaper(wallpaper)
+    invitation.wallpaper = stored.url
+    invitation.wallpaper_variants = stored.variants
 
     write_db.add(invitation)
     await write_db.commit()
     await write_db.refresh(invitation)
 
+    # delete old wallpaper unless a template or another invitation still uses it
+    await release_media(write_db, [old_wallpaper])
+
     # --- READ PART (fresh session) ---
-    result = await read_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation.id)
+    invitation_with_rel = await load_invitation_document(
+        read_db, Invitation.id == invitation.id
     )
-    invitation_with_rel = result.scalars().first()
+    await publish_snapshot(invitation_with_rel)
 
-    return invitation_with_rel
+    return invitation_with_rel.response()
 
 
 # -------------------- Upload slides (save) --------------------
@@ -881,11 +980,14 @@ async def upload_slides(
     except json.JSONDecodeError:
         raise HTTPException(400, "Invalid existing_slides data")
 
+    # Files of removed slides, deleted after commit if nothing else uses them
+    removed_urls: list[str] = []
+
     # Delete slides that are no longer kept
     for idx, url in enumerate(existing_urls):
         if url is None and idx < len(invitation.slideshow_images):
             old_slide = invitation.slideshow_images[idx]
-            await slide_service._delete(old_slide.file_url)
+            removed_urls.append(old_slide.file_url)
             await write_db.delete(old_slide)
 
     # Keep only the slides still present
@@ -907,102 +1009,172 @@ async def upload_slides(
     else:
         # No slideshow selected -> remove all existing slides
         for slide in invitation.slideshow_images:
-            await slide_service._delete(slide.file_url)
+            removed_urls.append(slide.file_url)
             await write_db.delete(slide)
         invitation.slideshow_images = []
 
         invitation.selected_slideshow = None
         invitation.selected_slideshow_obj = None
 
-    # Upload new slides (new files in frontend)
-    if slides:
-        for idx, file in enumerate(slides):
-            file_url = await slide_service.upload_slide(
-                file, folder=f"slides/{invitation_id}"
-            )
-            invitation.slideshow_images.append(
-                SlideshowImage(
-                    file_url=file_url,
-                    invitation_id=invitation.id,
-                    slideshow_id=selected_slideshow_obj.id
-                    if selected_slideshow_obj
-                    else None,
-                    order=len(invitation.slideshow_images),
-                )
+    # Upload new slides (new files in frontend), all of them or none
+    try:
+        new_slides = await slide_service.upload_slides(slides or [])
+    except SlideUploadError as e:
+        await write_db.rollback()
+        await discard_uploads(write_db, e.uploaded_urls, e.created_urls)
+        raise HTTPException(400, str(e))
+
+    for stored in new_slides:
+        invitation.slideshow_images.append(
+            SlideshowImage(
+                file_url=stored.url,
+                variants=stored.variants,
+                invitation_id=invitation.id,
+                slideshow_id=selected_slideshow_obj.id
+                if selected_slideshow_obj
+                else None,
+                order=len(invitation.slideshow_images),
             )
+        )
 
     await write_db.commit()
+    await release_media(write_db, removed_urls)
 
     # Fetch full invitation with all relationships
-    result = await read_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation.id)
+    invitation_full = await load_invitation_document(
+        read_db, Invitation.id == invitation.id
     )
-    invitation_full = result.scalars().first()
+    await publish_snapshot(invitation_full)
 
-    if invitation_full.selected_slideshow_obj:
-        invitation_full.selected_slideshow = invitation_full.selected_slideshow_obj.key
-    else:
-        invitation_full.selected_slideshow = None
+    invitation_data = invitation_full.data()
+    slideshow = invitation_data["selected_slideshow_obj"]
+    invitation_data["selected_slideshow"] = slideshow["key"] if slideshow else None
 
-    return InvitationRead.from_orm(invitation_full)
+    return invitation_data
 
 
-@router.post("/upload-audio/{invitation_id}", response_model=InvitationRead)
+@router.post(
+    "/upload-audio/{invitation_id}", response_model=InvitationRead | UploadJobRead
+)
 async def upload_invitation_audio(
     invitation_id: int,
+    request: Request,
     audio: UploadFile | None = File(None),
     write_db: AsyncSession = Depends(get_write_session),
     read_db: AsyncSession = Depends(get_read_session),
+    current_user: dict | None = Depends(get_current_user),
 ):
-    music_service = MusicService()
-
     # --- WRITE PART ---
     invitation = await write_db.get(Invitation, invitation_id)
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found")
+    owner = authorize_edit(invitation, request, current_user)
 
-    # Delete old background audio if exists
-    if invitation.background_audio:
+    # New audio is transcoded by a worker; background_audio is only set once it
+    # is done, the returned job can be polled at /uploads/jobs/{id}
+    if audio is not None:
+        staging = StagingService()
         try:
-            await music_service.delete_music(invitation.background_audio)
-        except Exception as e:
-            print(f"Failed to delete old audio: {e}")
-        invitation.background_audio = None
+            object_name = await staging.stage_upload(
+                audio,
+                staging.staging_prefix(invitation_id, "audio"),
+                ALLOWED_AUDIO_TYPES,
+                max_size_mb=MAX_AUDIO_UPLOAD_SIZE_MB,
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        return await queue_job(
+            "invitations.tasks.process_staged_upload",
+            "audio",
+            invitation_id=invitation_id,
+            object_name=object_name,
+            **owner,
+        )
 
-    # Upload new audio only if provided
-    if audio is not None:
-        url = await music_service.upload_music(audio)
-        invitation.background_audio = url
+    # No file -> remove the audio; it is deleted after commit if nothing else uses it
+    old_audio = invitation.background_audio
+    invitation.background_audio = None
+    invitation.background_audio_meta = None
 
     write_db.add(invitation)
     await write_db.commit()
     await write_db.refresh(invitation)
+    await release_media(write_db, [old_audio])
 
     # --- READ PART (fresh session) ---
-    result = await read_db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
+    invitation_with_rel = await load_invitation_document(
+        read_db, Invitation.id == invitation.id
+    )
+    await publish_snapshot(invitation_with_rel)
+
+    return invitation_with_rel.response()
+
+
+# -------------------- Direct-to-storage uploads --------------------
+@router.post("/uploads/{invitation_id}", response_model=StagedUploadRead)
+async def create_staged_upload(
+    invitation_id: int,
+    payload: StagedUploadCreate,
+    request: Request,
+    read_db: AsyncSession = Depends(get_read_session),
+    current_user: dict | None = Depends(get_current_user),
+):
+    """Presigned POST form the browser uploads the raw file with, bypassing the API."""
+    invitation = await read_db.get(Invitation, invitation_id)
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    authorize_edit(invitation, request, current_user)
+
+    try:
+        return await StagingService().create_upload(
+            invitation_id,
+            payload.kind.value,
+            payload.filename,
+            payload.content_type,
         )
-        .where(Invitation.id == invitation.id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/uploads/{invitation_id}/complete", response_model=UploadJobRead)
+async def complete_staged_upload(
+    invitation_id: int,
+    payload: StagedUploadComplete,
+    request: Request,
+    read_db: AsyncSession = Depends(get_read_session),
+    current_user: dict | None = Depends(get_current_user),
+):
+    """Queue processing of an uploaded staging object and return the job to poll."""
+    invitation = await read_db.get(Invitation, invitation_id)
+    if not invitation:
+        raise HTTPException(status_code=404, detail="Invitation not found")
+    owner = authorize_edit(invitation, request, current_user)
+
+    prefix = StagingService().staging_prefix(invitation_id, payload.kind.value)
+    if not payload.object_name.startswith(prefix) or ".." in payload.object_name:
+        raise HTTPException(status_code=400, detail="Invalid upload object")
+
+    return await queue_job(
+        "invitations.tasks.process_staged_upload",
+        payload.kind.value,
+        invitation_id=invitation_id,
+        object_name=payload.object_name,
+        **owner,
     )
-    invitation_with_rel = result.scalars().first()
 
-    return invitation_with_rel
+
+@router.get("/uploads/jobs/{job_id}", response_model=UploadJobRead)
+async def get_upload_job(
+    job_id: str,
+    request: Request,
+    current_user: dict | None = Depends(get_current_user),
+):
+    job = await get_job(job_id)
+    # Someone else's job is reported as missing, not as forbidden
+    if not job or not owns_job(job, request, current_user):
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 # -------------------- RSVP / Guest Endpoints --------------------
@@ -1267,24 +1439,12 @@ async def check_ready_to_purchase(
     invitation_id: int, db: AsyncSession = Depends(get_read_session)
 ):
     """Check if an invitation has all mandatory fields filled before purchase."""
-    result = await db.execute(
-        select(Invitation)
-        .options(
-            selectinload(Invitation.rsvp),
-            selectinload(Invitation.events),
-            selectinload(Invitation.selected_game_obj),
-            selectinload(Invitation.selected_slideshow_obj),
-            selectinload(Invitation.slideshow_images),
-            selectinload(Invitation.font_obj),
-        )
-        .where(Invitation.id == invitation_id)
-    )
-    invitation = result.scalar_one_or_none()
+    invitation = await load_invitation_document(db, Invitation.id == invitation_id)
 
     if not invitation:
         raise HTTPException(status_code=404, detail="Invitation not found")
 
-    invitation_data = InvitationRead.model_validate(invitation)
+    invitation_data = InvitationRead.model_validate(invitation.data())
     missing: List[str] = []
 
     # --- Invitation fields ---
@@ -1,3 +1,5 @@
+import json
+import time
 import redis
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -5,12 +7,29 @@ from contextlib import asynccontextmanager
 
 from app.celery_app import celery_app
 from app.db.celery_session import get_write_session
-from app.db.models.invitation import Invitation, InvitationStatus, RSVP, Guest
+from app.db.models.invitation import (
+    Invitation,
+    InvitationStatus,
+    Template,
+    RSVP,
+    Guest,
+    Slideshow,
+    SlideshowImage,
+)
+from app.core.settings import settings
+from app.services.archive import archive_invitations
+from app.services.media import collect_garbage, release_media
+from app.services.helpers import any_id
+from app.services.jobs import JobStatus, get_job, update_job
+from app.services.expiry import clear_expiries, due_expiries
+from app.services.snapshots import invalidate_snapshots
+from app.services.cache import cache
+from app.services.s3.staging import STAGED_UPLOAD_MAX_SIZE_MB, StagingService
 from app.services.s3.wallpaper import WallpaperService
 from app.services.s3.slide import SlideService
 from app.services.s3.music import MusicService
+from sqlalchemy import delete, func, update
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
 
 # -------------------- Redis Lock --------------------
 redis_client = redis.Redis(host="redis", port=6379, db=0)
@@ -29,71 +48,138 @@ async def get_session() -> AsyncSession:
 
 
 # -------------------- Async Task Logic --------------------
-async def delete_expired_invitations_async():
-    """Delete all invitations whose active_until has passed."""
-    now = datetime.utcnow()
-    async with get_session() as session:
-        # Fetch expired invitations with all relationships
-        result = await session.execute(
-            select(Invitation)
-            .options(
-                selectinload(Invitation.rsvp)
-                .selectinload(RSVP.guests)
-                .selectinload(Guest.sub_guests),
-                selectinload(Invitation.events),
-                selectinload(Invitation.slideshow_images),
+# Invitations deleted per transaction
+CLEANUP_BATCH_SIZE = 500
+# Checkpoints of an interrupted run are kept this long for the next run to resume
+CLEANUP_CHECKPOINT_TTL = 7 * 24 * 60 * 60
+
+
+async def purge_invitations(session: AsyncSession, ids: list[int]):
+    """
+    Archive published invitations to the media bucket, then delete invitations
+    and everything hanging off them with set-based statements.
+    Events go through their ON DELETE CASCADE foreign key (and are not counted).
+    Does not commit: the archive rows land with the deletes or not at all.
+    Returns (rows deleted, media URLs to release after commit).
+    """
+    bulk = {"synchronize_session": False}
+
+    await archive_invitations(session, ids)
+
+    slides = await session.execute(
+        delete(SlideshowImage)
+        .where(SlideshowImage.invitation_id == any_id(ids))
+        .returning(SlideshowImage.file_url)
+        .execution_options(**bulk)
+    )
+    media_urls = list(slides.scalars().all())
+    slide_count = len(media_urls)
+
+    invitations = (
+        await session.execute(
+            delete(Invitation)
+            .where(Invitation.id == any_id(ids))
+            .returning(
+                Invitation.rsvp_id,
+                Invitation.slug,
+                Invitation.wallpaper,
+                Invitation.background_audio,
             )
-            .where(Invitation.active_until <= now)
+            .execution_options(**bulk)
         )
-        expired_invitations = result.scalars().all()
-
-        wallpaper_service = WallpaperService()
-        slide_service = SlideService()
-        music_service = MusicService()
-
-        for invitation in expired_invitations:
-            # Delete wallpaper
-            if invitation.wallpaper:
-                try:
-                    await wallpaper_service._delete(invitation.wallpaper)
-                except Exception as e:
-                    print(f"Failed to delete wallpaper: {e}")
-
-            # Delete background audio
-            if invitation.background_audio:
-                try:
-                    await music_service.delete_music(invitation.background_audio)
-                except Exception as e:
-                    print(f"Failed to delete audio: {e}")
-
-            # Delete slideshow images
-            for slide in invitation.slideshow_images:
-                try:
-                    await slide_service._delete(slide.file_url)
-                except Exception as e:
-                    print(f"Failed to delete slide {slide.id}: {e}")
-                await session.delete(slide)
-
-            # Delete events
-            for event in invitation.events:
-                await session.delete(event)
-
-            # Delete RSVP & Guests
-            if invitation.rsvp:
-                for guest in invitation.rsvp.guests:
-                    for sub in guest.sub_guests:
-                        sub.main_guest_id = None
-                        session.add(sub)
-                    await session.delete(guest)
-                await session.delete(invitation.rsvp)
-
-            # Delete invitation itself
-            await session.delete(invitation)
-
-        await session.commit()
-        print(
-            f"Deleted {len(expired_invitations)} expired invitations at {now.isoformat()}"
+    ).all()
+    rsvp_ids = [row.rsvp_id for row in invitations]
+    for row in invitations:
+        media_urls.extend([row.wallpaper, row.background_audio])
+
+    # Sub guests may point at main guests being deleted
+    await session.execute(
+        update(Guest)
+        .where(
+            Guest.main_guest_id.in_(
+                select(Guest.id).where(Guest.rsvp_id == any_id(rsvp_ids))
+            )
         )
+        .values(main_guest_id=None)
+        .execution_options(**bulk)
+    )
+    guests = await session.execute(
+        delete(Guest).where(Guest.rsvp_id == any_id(rsvp_ids)).execution_options(**bulk)
+    )
+    rsvps = await session.execute(
+        delete(RSVP).where(RSVP.id == any_id(rsvp_ids)).execution_options(**bulk)
+    )
+
+    rows = slide_count + len(invitations) + guests.rowcount + rsvps.rowcount
+    # Dropped before the commit: a snapshot re-filled in between is fenced off
+    # by the version bump, and a failed commit only costs a cache miss
+    await invalidate_snapshots(*(row.slug for row in invitations))
+    return rows, media_urls
+
+
+async def run_cleanup(name: str, condition) -> dict:
+    """
+    Delete every invitation matching `condition(now)` in keyset-ordered batches,
+    committing (and releasing media) per batch. The cutoff and last committed id
+    are checkpointed in Redis, so a crashed run is resumed by the next one.
+    """
+    checkpoint_key = f"cleanup:{name}"
+    checkpoint = redis_client.get(checkpoint_key)
+    if checkpoint:
+        state = json.loads(checkpoint)
+        print(f"Resuming {name} after invitation {state['last_id']}")
+    else:
+        state = {
+            "now": datetime.utcnow().isoformat(),
+            "last_id": 0,
+            "invitations": 0,
+            "rows": 0,
+        }
+    now = datetime.fromisoformat(state["now"])
+
+    started = time.monotonic()
+    rows = 0
+    async with get_session() as session:
+        while True:
+            result = await session.execute(
+                select(Invitation.id)
+                .where(condition(now), Invitation.id > state["last_id"])
+                .order_by(Invitation.id)
+                .limit(CLEANUP_BATCH_SIZE)
+            )
+            ids = list(result.scalars().all())
+            if not ids:
+                break
+
+            batch_rows, media_urls = await purge_invitations(session, ids)
+            await session.commit()
+            await release_media(session, media_urls)
+
+            rows += batch_rows
+            state.update(
+                last_id=ids[-1],
+                invitations=state["invitations"] + len(ids),
+                rows=state["rows"] + batch_rows,
+            )
+            redis_client.set(
+                checkpoint_key, json.dumps(state), ex=CLEANUP_CHECKPOINT_TTL
+            )
+
+    redis_client.delete(checkpoint_key)
+    elapsed = max(time.monotonic() - started, 1e-6)
+    print(
+        f"{name}: deleted {state['invitations']} invitations ({state['rows']} rows) "
+        f"for cutoff {now.isoformat()}, {rows / elapsed:.0f} rows/s"
+    )
+    return state
+
+
+async def delete_expired_invitations_async():
+    """Delete all invitations whose active_until has passed."""
+    await run_cleanup(
+        "delete_expired_invitations",
+        lambda now: Invitation.active_until <= now,
+    )
 
 
 # -------------------- Celery Task Entry --------------------
@@ -112,74 +198,17 @@ def delete_expired_invitations():
     finally:
         redis_client.delete(lock_key)
 
+
 async def delete_expired_and_old_drafts_async():
     """Delete expired invitations and draft invitations older than 30 days."""
-    now = datetime.utcnow()
-    draft_cutoff = now - timedelta(days=30)
-
-    async with get_session() as session:
-        # Fetch invitations to delete: expired OR old drafts
-        result = await session.execute(
-            select(Invitation)
-            .options(
-                selectinload(Invitation.rsvp)
-                .selectinload(RSVP.guests)
-                .selectinload(Guest.sub_guests),
-                selectinload(Invitation.events),
-                selectinload(Invitation.slideshow_images),
-            )
-            .where(
-                (Invitation.active_until <= now) | 
-                ((Invitation.status == InvitationStatus.DRAFT) & (Invitation.created_at <= draft_cutoff))
-            )
-        )
-        invitations_to_delete = result.scalars().all()
-
-        wallpaper_service = WallpaperService()
-        slide_service = SlideService()
-        music_service = MusicService()
-
-        for invitation in invitations_to_delete:
-            # Delete wallpaper
-            if invitation.wallpaper:
-                try:
-                    await wallpaper_service._delete(invitation.wallpaper)
-                except Exception as e:
-                    print(f"Failed to delete wallpaper: {e}")
-
-            # Delete background audio
-            if invitation.background_audio:
-                try:
-                    await music_service.delete_music(invitation.background_audio)
-                except Exception as e:
-                    print(f"Failed to delete audio: {e}")
-
-            # Delete slideshow images
-            for slide in invitation.slideshow_images:
-                try:
-                    await slide_service._delete(slide.file_url)
-                except Exception as e:
-                    print(f"Failed to delete slide {slide.id}: {e}")
-                await session.delete(slide)
-
-            # Delete events
-            for event in invitation.events:
-                await session.delete(event)
-
-            # Delete RSVP & Guests
-            if invitation.rsvp:
-                for guest in invitation.rsvp.guests:
-                    for sub in guest.sub_guests:
-                        sub.main_guest_id = None
-                        session.add(sub)
-                    await session.delete(guest)
-                await session.delete(invitation.rsvp)
-
-            # Delete invitation itself
-            await session.delete(invitation)
-
-        await session.commit()
-        print(f"Deleted {len(invitations_to_delete)} invitations at {now.isoformat()}")
+    await run_cleanup(
+        "delete_expired_and_old_drafts",
+        lambda now: (Invitation.active_until <= now)
+        | (
+            (Invitation.status == InvitationStatus.DRAFT)
+            & (Invitation.created_at <= now - timedelta(days=30))
+        ),
+    )
 
 
 @celery_app.task(name="invitations.tasks.delete_expired_and_old_drafts")
@@ -196,3 +225,296 @@ def delete_expired_and_old_drafts():
         loop.run_until_complete(delete_expired_and_old_drafts_async())
     finally:
         redis_client.delete(lock_key)
+
+
+# -------------------- Anonymous drafts --------------------
+# Drafts younger than this are left alone, whatever their session looks like
+ANONYMOUS_DRAFT_GRACE = timedelta(hours=1)
+
+
+def expired_anonymous_sessions(session_ids: set[str]) -> set[str]:
+    """The ids in `session_ids` whose `anonymous_session:*` key is gone."""
+    ordered = sorted(session_ids)
+    pipeline = redis_client.pipeline(transaction=False)
+    for session_id in ordered:
+        pipeline.exists(f"anonymous_session:{session_id}")
+    return {
+        session_id
+        for session_id, exists in zip(ordered, pipeline.execute())
+        if not exists
+    }
+
+
+async def reclaim_anonymous_drafts_async() -> dict:
+    """
+    Delete anonymous drafts whose session key has expired: no cookie can reach
+    them any more. Draft owners are diffed against the live session keys one
+    keyset batch at a time, so drafts go hours after their session, not 30 days.
+    """
+    cutoff = datetime.utcnow() - ANONYMOUS_DRAFT_GRACE
+    stats = {"scanned": 0, "invitations": 0, "rows": 0}
+    last_id = 0
+    async with get_session() as session:
+        while True:
+            result = await session.execute(
+                select(Invitation.id, Invitation.anon_session_id)
+                .where(
+                    Invitation.status == InvitationStatus.DRAFT,
+                    Invitation.owner_id.is_(None),
+                    Invitation.anon_session_id.is_not(None),
+                    Invitation.created_at <= cutoff,
+                    Invitation.id > last_id,
+                )
+                .order_by(Invitation.id)
+                .limit(CLEANUP_BATCH_SIZE)
+            )
+            drafts = result.all()
+            if not drafts:
+                break
+            last_id = drafts[-1].id
+            stats["scanned"] += len(drafts)
+
+            expired = expired_anonymous_sessions(
+                {draft.anon_session_id for draft in drafts}
+            )
+            if not expired:
+                continue
+
+            # Re-checked under a row lock: a login may be claiming the draft right now
+            result = await session.execute(
+                select(Invitation.id)
+                .where(
+                    Invitation.id == any_id([draft.id for draft in drafts]),
+                    Invitation.status == InvitationStatus.DRAFT,
+                    Invitation.owner_id.is_(None),
+                    Invitation.anon_session_id.in_(expired),
+                )
+                .with_for_update(skip_locked=True)
+            )
+            ids = list(result.scalars().all())
+            if not ids:
+                await session.rollback()
+                continue
+
+            batch_rows, media_urls = await purge_invitations(session, ids)
+            await session.commit()
+            await release_media(session, media_urls)
+            stats["invitations"] += len(ids)
+            stats["rows"] += batch_rows
+
+    print(
+        f"Reclaimed {stats['invitations']} anonymous drafts ({stats['rows']} rows) "
+        f"of {stats['scanned']} scanned"
+    )
+    return stats
+
+
+@celery_app.task(name="invitations.tasks.reclaim_anonymous_drafts")
+def reclaim_anonymous_drafts():
+    lock_key = "lock:reclaim_anonymous_drafts"
+    have_lock = redis_client.set(lock_key, "locked", nx=True, ex=60 * 60)
+    if not have_lock:
+        print("Lock exists, skipping the task.")
+        return
+
+    try:
+        loop = celery_app.asyncio_loop
+        loop.run_until_complete(reclaim_anonymous_drafts_async())
+    finally:
+        redis_client.delete(lock_key)
+
+
+# -------------------- Expiry queue --------------------
+# Invitations expired per statement, and at most per run of the drain
+EXPIRY_BATCH_SIZE = 200
+EXPIRY_MAX_BATCHES = 25
+
+
+async def expire_due_invitations_async():
+    """
+    Flip invitations whose queued expiry is due to EXPIRED. Rows only change
+    status here; their data and media are purged later by the nightly cleanup.
+    """
+    now = datetime.utcnow()
+    expired = 0
+    async with get_session() as session:
+        for _ in range(EXPIRY_MAX_BATCHES):
+            ids = await due_expiries(now, EXPIRY_BATCH_SIZE)
+            if not ids:
+                break
+
+            # active_until is re-checked: a renewal may have moved it since queuing
+            result = await session.execute(
+                update(Invitation)
+                .where(
+                    Invitation.id == any_id(ids),
+                    Invitation.status == InvitationStatus.ACTIVE,
+                    Invitation.active_until <= now,
+                )
+                .values(status=InvitationStatus.EXPIRED, is_active=False)
+                .returning(Invitation.slug)
+                .execution_options(synchronize_session=False)
+            )
+            slugs = list(result.scalars().all())
+            await session.commit()
+            await invalidate_snapshots(*slugs)
+            await clear_expiries(ids)
+            expired += len(slugs)
+
+    if expired:
+        print(f"Expired {expired} invitations at {now.isoformat()}")
+
+
+@celery_app.task(name="invitations.tasks.expire_due_invitations")
+def expire_due_invitations():
+    lock_key = "lock:expire_due_invitations"
+    have_lock = redis_client.set(lock_key, "locked", nx=True, ex=60)
+    if not have_lock:
+        print("Lock exists, skipping the task.")
+        return
+
+    try:
+        loop = celery_app.asyncio_loop
+        loop.run_until_complete(expire_due_invitations_async())
+    finally:
+        redis_client.delete(lock_key)
+
+
+# -------------------- Media garbage collection --------------------
+async def collect_media_garbage_async(dry_run: bool) -> dict:
+    async with get_session() as session:
+        report = await collect_garbage(session, dry_run=dry_run)
+
+    action = "Would reclaim" if dry_run else "Reclaimed"
+    print(
+        f"{action} {report['orphaned']} orphaned objects "
+        f"({report['bytes'] / (1024 * 1024):.2f} MB) of {report['scanned']} scanned, "
+        f"{report['deleted']} deleted, {len(report['failed'])} failed"
+    )
+    for prefix, counts in report["prefixes"].items():
+        print(f"  {prefix}: {counts}")
+    return report
+
+
+@celery_app.task(name="invitations.tasks.collect_media_garbage")
+def collect_media_garbage(dry_run: bool | None = None):
+    """Remove unreferenced objects from the media bucket; returns the report."""
+    lock_key = "lock:collect_media_garbage"
+    have_lock = redis_client.set(lock_key, "locked", nx=True, ex=60 * 60)
+    if not have_lock:
+        print("Lock exists, skipping the task.")
+        return
+
+    if dry_run is None:
+        dry_run = settings.MEDIA_GC_DRY_RUN
+
+    try:
+        loop = celery_app.asyncio_loop
+        return loop.run_until_complete(collect_media_garbage_async(dry_run))
+    finally:
+        redis_client.delete(lock_key)
+
+
+# -------------------- Staged uploads --------------------
+async def attach_staged_upload(session: AsyncSession, job: dict, upload) -> list[str]:
+    """
+    Convert a staged file and attach it to the job's invitation (or template).
+    Returns replaced URLs.
+    """
+    if job.get("template_id"):
+        owner = await session.get(Template, job["template_id"])
+        if not owner:
+            raise ValueError("Template not found")
+    else:
+        owner = invitation = await session.get(Invitation, job["invitation_id"])
+        if not owner:
+            raise ValueError("Invitation not found")
+
+    kind = job["kind"]
+    replaced_urls: list[str] = []
+
+    async def report_progress(progress: float):
+        await update_job(job["id"], progress=round(progress, 3))
+
+    if kind == "wallpaper":
+        stored = await WallpaperService().upload_wallpaper(upload)
+        replaced_urls.append(owner.wallpaper)
+        owner.wallpaper = stored.url
+        owner.wallpaper_variants = stored.variants
+
+    elif kind == "audio":
+        stored = await MusicService().upload_music(
+            upload, on_progress=report_progress
+        )
+        replaced_urls.append(owner.background_audio)
+        owner.background_audio = stored.url
+        owner.background_audio_meta = stored.meta
+
+    elif kind == "slide" and not job.get("template_id"):
+        result = await session.execute(
+            select(Slideshow).where(Slideshow.key == invitation.selected_slideshow)
+        )
+        slideshow = result.scalars().first()
+        if not slideshow:
+            raise ValueError("No slideshow selected")
+
+        result = await session.execute(
+            select(func.count())
+            .select_from(SlideshowImage)
+            .where(SlideshowImage.invitation_id == invitation.id)
+        )
+        stored = await SlideService().upload_slide(upload)
+        session.add(
+            SlideshowImage(
+                file_url=stored.url,
+                variants=stored.variants,
+                invitation_id=invitation.id,
+                slideshow_id=slideshow.id,
+                order=result.scalar_one(),
+            )
+        )
+
+    else:
+        raise ValueError(f"Unknown upload kind {kind}")
+
+    return replaced_urls
+
+
+async def process_staged_upload_async(job_id: str):
+    """Convert an upload from staging/ and attach it to its invitation or template."""
+    job = await get_job(job_id)
+    if not job:
+        print(f"Upload job {job_id} not found, skipping.")
+        return
+
+    await update_job(job_id, status=JobStatus.PROCESSING)
+    staging = StagingService()
+
+    try:
+        upload = await staging.open_upload(
+            job["object_name"], STAGED_UPLOAD_MAX_SIZE_MB[job["kind"]]
+        )
+        with upload.file:
+            async with get_session() as session:
+                replaced_urls = await attach_staged_upload(session, job, upload)
+                await session.commit()
+                await release_media(session, replaced_urls)
+                if job.get("template_id"):
+                    await cache.invalidate(f"template:{job['template_id']}")
+                else:
+                    # Still in the identity map, no query
+                    invitation = await session.get(Invitation, job["invitation_id"])
+                    await invalidate_snapshots(invitation.slug)
+    except Exception as e:
+        print(f"Upload job {job_id} failed: {e}")
+        await update_job(job_id, status=JobStatus.FAILED, error=str(e))
+    else:
+        await update_job(job_id, status=JobStatus.DONE)
+    finally:
+        await staging.discard(job["object_name"])
+
+
+@celery_app.task(name="invitations.tasks.process_staged_upload")
+def process_staged_upload(job_id: str):
+    loop = celery_app.asyncio_loop
+    loop.run_until_complete(process_staged_upload_async(job_id))
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.db.session import replicas
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (per API process)."""
+    return PlainTextResponse(
+        replicas.metrics(), media_type="text/plain; version=0.0.4"
+    )
@@ -18,6 +18,8 @@ from app.db.models.order import Order, OrderStatus, Voucher, PriceTier, Currency
 from app.db.models.invitation import Invitation, InvitationStatus
 from app.services.pagination import paginate
 from app.services.email import render_email, send_email
+from app.services.expiry import schedule_expiry
+from app.services.snapshots import invalidate_snapshots
 from app.schemas.order import (
     OrderCreate,
     OrderRead,
@@ -334,6 +336,15 @@ async def update_order_with_tiers(
 
 
 # -------------------- Initiate Payment --------------------
+async def queue_invitation_expiry(invitation: Invitation):
+    """Have the expiry drain flip the invitation to EXPIRED once active_until passes."""
+    try:
+        await schedule_expiry(invitation.id, invitation.active_until)
+    except Exception as e:
+        # The nightly cleanup still catches it, the order must not fail over this
+        print(f"Failed to queue expiry of invitation {invitation.id}: {e}")
+
+
 @router.post("/initiate-payment/{order_number}")
 async def initiate_payment(
     order_number: str,
@@ -395,6 +406,9 @@ async def initiate_payment(
 
         # Commit changes — no need to call add()
         await write_db.commit()
+        if order.invitation:
+            await queue_invitation_expiry(order.invitation)
+            await invalidate_snapshots(order.invitation.slug)
 
         html_body = render_email(
             "orders/successful_order.html",
@@ -523,6 +537,9 @@ async def stripe_webhook(
         # Commit all changes
         write_db.add(order)
         await write_db.commit()
+        if order.invitation:
+            await queue_invitation_expiry(order.invitation)
+            await invalidate_snapshots(order.invitation.slug)
 
         html_body = render_email(
             "orders/successful_order.html",
@@ -6,17 +6,19 @@ from sqlalchemy import func
 from sqlalchemy.orm import selectinload
 from xml.sax.saxutils import escape
 from datetime import datetime
-from typing import List, Any
+from typing import List
 from transliterate import translit
 
-from app.core.redis_client import get_redis_client
 from app.db.session import get_read_session
 from app.db.models.blog import BlogPost
 from app.db.models.invitation import Template, Category
+from app.services.cache import cache
 from pydantic import BaseModel
 
-REDIS_KEY = "sitemap_xml"
+CACHE_KEY = "sitemap_xml"
 CACHE_TTL_SECONDS = 24 * 60 * 60  # 24h cache
+# Rebuilt when a post, template or category changes, or on /sitemap/flush
+CACHE_TAGS = ("blogposts", "templates", "catalog:categories", "sitemap")
 
 router = APIRouter()
 
@@ -32,16 +34,7 @@ def slugifycats(name: str) -> str:
     return slug
 
 
-@router.get("/sitemap.xml", response_class=Response)
-async def sitemap(
-    db: AsyncSession = Depends(get_read_session),
-    redis: Any = Depends(get_redis_client),
-):
-    # --- Try cached sitemap ---
-    cached_sitemap = await redis.get(REDIS_KEY)
-    if cached_sitemap:
-        return Response(content=cached_sitemap, media_type="application/xml")
-
+async def build_sitemap(db: AsyncSession) -> str:
     base_url = "https://www.moyatapokana.bg"
     urls: List[UrlEntry] = []
 
@@ -129,14 +122,23 @@ async def sitemap(
         xml += f"    <lastmod>{url.lastmod.date()}</lastmod>\n"
         xml += "  </url>\n"
     xml += "</urlset>"
+    return xml
 
-    # --- Cache in Redis ---
-    await redis.set(REDIS_KEY, xml, ex=CACHE_TTL_SECONDS)
 
+@router.get("/sitemap.xml", response_class=Response)
+async def sitemap(db: AsyncSession = Depends(get_read_session)):
+    xml = await cache.get_or_load(
+        CACHE_KEY,
+        lambda: build_sitemap(db),
+        ttl=CACHE_TTL_SECONDS,
+        tags=CACHE_TAGS,
+        encode=str,
+        decode=str,
+    )
     return Response(content=xml, media_type="application/xml")
 
 
 @router.get("/sitemap/flush")
-async def flush_sitemap_cache(redis: Any = Depends(get_redis_client)):
-    await redis.delete(REDIS_KEY)
+async def flush_sitemap_cache():
+    await cache.invalidate("sitemap")
     return {"status": "ok", "message": "Sitemap cache cleared"}
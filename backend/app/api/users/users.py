@@ -34,6 +34,7 @@ from app.schemas.user import (
 from app.services.email import send_email, render_email
 from app.services.stats import increment_daily_user_stat
 from app.services.s3.profile_picture import ProfilePictureService
+from app.services.media import release_media
 from app.services.auth import (
     authenticate_user,
     create_session,
@@ -241,19 +242,17 @@ async def update_profile(
     if last_name:
         user.last_name = last_name
 
+    old_picture = None
     if profile_picture:
         profile_service = ProfilePictureService()
-        if user.profile_picture:
-            try:
-                await profile_service._delete(user.profile_picture)
-            except Exception as e:
-                print(f"Failed to delete old profile picture: {e}")
+        old_picture = user.profile_picture
         url = await profile_service.upload_profile_picture(profile_picture)
         user.profile_picture = url
 
     db_write.add(user)
     await db_write.commit()
     await db_write.refresh(user)
+    await release_media(db_write, [old_picture])
     await update_session_data(session_data["session_id"], user)
 
     return UserUpdate(
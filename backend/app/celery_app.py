@@ -1,7 +1,8 @@
 from celery import Celery
 from celery.schedules import crontab
-from celery.signals import worker_process_init
+from celery.signals import worker_init, worker_process_init
 import asyncio
+from app.services.s3.image_engine import image_engine
 
 celery_app = Celery(
     "app",
@@ -23,6 +24,10 @@ celery_app.conf.beat_schedule = {
         "task": "app.tasks.update_currency_rates",
         "schedule": crontab(hour=0, minute=0),
     },
+    "expire_due_invitations_every_minute": {
+        "task": "invitations.tasks.expire_due_invitations",
+        "schedule": crontab(),
+    },
     "delete_expired_invitations_async": {
         "task": "invitations.tasks.delete_expired_invitations",
         "schedule": crontab(hour=1, minute=0),
@@ -31,10 +36,27 @@ celery_app.conf.beat_schedule = {
         "task": "invitations.tasks.delete_expired_and_old_drafts",
         "schedule": crontab(hour=2, minute=0),
     },
+    "reclaim_anonymous_drafts_hourly": {
+        "task": "invitations.tasks.reclaim_anonymous_drafts",
+        "schedule": crontab(minute=30),
+    },
+    "collect_media_garbage_daily": {
+        "task": "invitations.tasks.collect_media_garbage",
+        "schedule": crontab(hour=4, minute=0),
+    },
 }
 
 celery_app.conf.timezone = "UTC"
 
+@worker_init.connect
+@worker_process_init.connect
+def init_image_engine(**kwargs):
+    # Prefork children can't start a process pool of their own (and one per child
+    # would oversubscribe the CPUs): image transforms run on a thread instead.
+    # worker_init runs before the pool forks, the children inherit it.
+    image_engine.use_threads()
+
+
 @worker_process_init.connect
 def init_asyncio_loop(**kwargs):
     loop = asyncio.new_event_loop()
@@ -0,0 +1,41 @@
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers
+
+DETAIL = "Request body too large"
+
+
+class BodySizeLimitMiddleware:
+    """
+    Reject request bodies over `max_bytes` before anything reads them: from the
+    Content-Length header up front, while receiving for chunked bodies.
+    Starlette parses (and spools) a whole multipart form before the endpoint
+    runs, so the per-file limits of S3Base._ingest can't stop that on their own.
+    """
+
+    def __init__(self, app, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        length = Headers(scope=scope).get("content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            response = JSONResponse({"detail": DETAIL}, status_code=413)
+            return await response(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parser, answered by FastAPI
+                    raise HTTPException(status_code=413, detail=DETAIL)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -27,12 +27,74 @@ class Settings:
     # Database / Celery
     DATABASE_URL_WRITER: str | None = os.getenv("DATABASE_URL_WRITER")
     DATABASE_URL_READER: str | None = os.getenv("DATABASE_URL_READER")
+    # Optional second replica, read from while the first one is unhealthy
+    DATABASE_URL_READER_FALLBACK: str | None = os.getenv("DATABASE_URL_READER_FALLBACK")
     CELERY_DATABASE_URL_WRITER: str | None = os.getenv("DATABASE_URL_WRITER")
     CELERY_DATABASE_URL_READER: str | None = os.getenv("DATABASE_URL_READER")
+    # Connection pool per engine (API processes); "null" opens a connection per session
+    DB_POOL: str = os.getenv("DB_POOL", "queue")
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+    # Behind pgbouncer in transaction mode: no server-side prepared statement reuse
+    DB_PGBOUNCER: bool = os.getenv("DB_PGBOUNCER", "true").lower() == "true"
+    # Per-engine statement timeouts in milliseconds, 0 disables
+    DB_WRITER_STATEMENT_TIMEOUT_MS: int = int(
+        os.getenv("DB_WRITER_STATEMENT_TIMEOUT_MS", 30000)
+    )
+    DB_READER_STATEMENT_TIMEOUT_MS: int = int(
+        os.getenv("DB_READER_STATEMENT_TIMEOUT_MS", 10000)
+    )
+    # Behind pgbouncer the timeouts come from its connect_query; where that can't
+    # be configured, SET LOCAL them in every transaction (one round trip each)
+    DB_SET_LOCAL_TIMEOUT: bool = (
+        os.getenv("DB_SET_LOCAL_TIMEOUT", "false").lower() == "true"
+    )
+    # After a write, the client's reads stay on the writer until the replica has
+    # replayed it, for at most this long
+    READ_YOUR_WRITES_TTL_SECONDS: int = int(
+        os.getenv("READ_YOUR_WRITES_TTL_SECONDS", 60)
+    )
+    # Replica health: probed every interval; failing this many probes/connects in a
+    # row or lagging more than the max diverts reads until enough probes pass again
+    REPLICA_PROBE_INTERVAL_SECONDS: float = float(
+        os.getenv("REPLICA_PROBE_INTERVAL_SECONDS", 5)
+    )
+    REPLICA_PROBE_TIMEOUT_SECONDS: float = float(
+        os.getenv("REPLICA_PROBE_TIMEOUT_SECONDS", 2)
+    )
+    REPLICA_MAX_LAG_SECONDS: float = float(os.getenv("REPLICA_MAX_LAG_SECONDS", 30))
+    REPLICA_FAILURE_THRESHOLD: int = int(os.getenv("REPLICA_FAILURE_THRESHOLD", 3))
+    REPLICA_RECOVERY_PROBES: int = int(os.getenv("REPLICA_RECOVERY_PROBES", 3))
+    # Forked Celery workers don't share pools across processes or event loops
+    CELERY_DB_POOL: str = os.getenv("CELERY_DB_POOL", "null")
+    CELERY_DB_STATEMENT_TIMEOUT_MS: int = int(
+        os.getenv("CELERY_DB_STATEMENT_TIMEOUT_MS", 300000)
+    )
 
     # Redis
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://redis:6379")
 
+    # Published invitations cached in Redis for guests (capped at active_until)
+    INVITATION_SNAPSHOT_TTL_SECONDS: int = int(
+        os.getenv("INVITATION_SNAPSHOT_TTL_SECONDS", 24 * 60 * 60)
+    )
+
+    # Single-flight loads: the lock outlives a stuck loader by this much at most,
+    # other pods wait this long for its result before loading themselves
+    SINGLE_FLIGHT_LOCK_SECONDS: float = float(
+        os.getenv("SINGLE_FLIGHT_LOCK_SECONDS", 10)
+    )
+    SINGLE_FLIGHT_WAIT_SECONDS: float = float(
+        os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", 3)
+    )
+
+    # In-process tier of app.services.cache, in front of Redis
+    CACHE_LOCAL_MAX_ENTRIES: int = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 1024))
+    CACHE_LOCAL_TTL_SECONDS: int = int(os.getenv("CACHE_LOCAL_TTL_SECONDS", 60))
+
     # Mail
     MAIL_HOST: str = os.getenv("MAIL_HOST", "localhost")
     MAIL_PORT: int = int(os.getenv("MAIL_PORT", 1025))
@@ -47,6 +109,32 @@ class Settings:
     S3_BUCKET: str | None = os.getenv("S3_BUCKET")
     S3_REGION: str | None = os.getenv("S3_REGION")
     S3_SECURE: bool = os.getenv("S3_SECURE", "false").lower() == "true"
+    S3_MAX_CONCURRENCY: int = int(os.getenv("S3_MAX_CONCURRENCY", 16))
+    S3_CONNECT_TIMEOUT: float = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+    S3_READ_TIMEOUT: float = float(os.getenv("S3_READ_TIMEOUT", 30))
+    S3_MAX_RETRIES: int = int(os.getenv("S3_MAX_RETRIES", 3))
+    # Host the browser uses to reach storage, presigned URLs are signed for it
+    S3_PUBLIC_ENDPOINT: str = os.getenv("S3_PUBLIC_ENDPOINT", "localhost:9000")
+    S3_PRESIGN_EXPIRE_SECONDS: int = int(os.getenv("S3_PRESIGN_EXPIRE_SECONDS", 900))
+    # Largest request body the API accepts, checked before multipart parsing.
+    # Fits the admin template form: wallpaper, music and five slides at 20MB each
+    MAX_REQUEST_BODY_MB: int = int(os.getenv("MAX_REQUEST_BODY_MB", 150))
+
+    # Image processing
+    # 0 workers runs transforms on a thread in the calling process (e.g. Celery workers)
+    IMAGE_WORKERS: int = int(os.getenv("IMAGE_WORKERS", os.cpu_count() or 1))
+    IMAGE_MAX_PENDING: int = int(os.getenv("IMAGE_MAX_PENDING", 0)) or IMAGE_WORKERS * 2 or 2
+    # Also store AVIF copies of wallpapers/slides (when Pillow is built with AVIF)
+    IMAGE_AVIF: bool = os.getenv("IMAGE_AVIF", "true").lower() == "true"
+
+    # Media garbage collection
+    # Objects younger than this are never collected: uploads land before their row commits
+    MEDIA_GC_GRACE_HOURS: int = int(os.getenv("MEDIA_GC_GRACE_HOURS", 24))
+    # Raw staging uploads nobody completed are dropped after this
+    MEDIA_GC_STAGING_MAX_AGE_HOURS: int = int(
+        os.getenv("MEDIA_GC_STAGING_MAX_AGE_HOURS", 24)
+    )
+    MEDIA_GC_DRY_RUN: bool = os.getenv("MEDIA_GC_DRY_RUN", "false").lower() == "true"
 
     # Google OAuth
     GOOGLE_CLIENT_ID: str | None = os.getenv("GOOGLE_CLIENT_ID")
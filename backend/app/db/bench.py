@@ -0,0 +1,122 @@
+"""
+Compare connection strategies against this deployment's database.
+
+    python -m app.db.bench --concurrency 20 --requests 2000
+    python -m app.db.bench --url "$DATABASE_URL_READER" --pools queue null --pgbouncer on off
+
+Every combination of pool and pgbouncer mode gets a fresh engine built by
+app.db.engine.create_engine, runs the same query from `concurrency` tasks
+and reports throughput and latency percentiles.
+"""
+import argparse
+import asyncio
+import itertools
+import statistics
+import time
+from sqlalchemy import text
+from app.core.settings import settings
+from app.db.engine import POOLS, create_engine
+
+DEFAULT_QUERY = "SELECT id, slug, status FROM invitations ORDER BY id DESC LIMIT 20"
+
+
+async def run(url, pool, pgbouncer, query, concurrency, requests, timeout_ms):
+    engine = create_engine(
+        url, pool=pool, pgbouncer=pgbouncer, statement_timeout_ms=timeout_ms
+    )
+    latencies: list[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                async with engine.connect() as connection:
+                    await connection.execute(text(query))
+            except Exception as e:
+                errors += 1
+                if errors == 1:
+                    print(f"  first error: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    # Warm up outside the measurement: pool fill, type introspection
+    async with engine.connect() as connection:
+        await connection.execute(text(query))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+
+    latencies.sort()
+
+    def percentile(p):
+        if not latencies:
+            return float("nan")
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+    return {
+        "pool": pool,
+        "pgbouncer": "on" if pgbouncer else "off",
+        "ok": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "mean": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "p50": percentile(0.50),
+        "p95": percentile(0.95),
+        "p99": percentile(0.99),
+    }
+
+
+async def main(args):
+    print(
+        f"{args.requests} x {args.query!r}, {args.concurrency} concurrent, "
+        f"pool size {settings.DB_POOL_SIZE}+{settings.DB_MAX_OVERFLOW}"
+    )
+    header = f"{'pool':<6} {'pgbouncer':<10} {'ok':>7} {'errors':>7} {'req/s':>9} {'mean ms':>9} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    for pool, pgbouncer in itertools.product(args.pools, args.pgbouncer):
+        result = await run(
+            args.url,
+            pool,
+            pgbouncer == "on",
+            args.query,
+            args.concurrency,
+            args.requests,
+            args.statement_timeout_ms,
+        )
+        print(
+            f"{result['pool']:<6} {result['pgbouncer']:<10} {result['ok']:>7} "
+            f"{result['errors']:>7} {result['rps']:>9.1f} {result['mean']:>9.2f} "
+            f"{result['p50']:>8.2f} {result['p95']:>8.2f} {result['p99']:>8.2f}"
+        )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default=settings.DATABASE_URL_READER)
+    parser.add_argument("--query", default=DEFAULT_QUERY)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--pools", nargs="+", choices=POOLS, default=list(POOLS))
+    # "off" against pgbouncer in transaction mode is expected to raise errors
+    parser.add_argument(
+        "--pgbouncer",
+        nargs="+",
+        choices=("on", "off"),
+        default=["on" if settings.DB_PGBOUNCER else "off"],
+    )
+    parser.add_argument(
+        "--statement-timeout-ms",
+        type=int,
+        default=settings.DB_READER_STATEMENT_TIMEOUT_MS,
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(parse_args()))
@@ -1,9 +1,25 @@
 from app.core.settings import settings
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from app.db.engine import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
-engine_writer = create_async_engine(settings.CELERY_DATABASE_URL_WRITER, echo=False)
-engine_reader = create_async_engine(settings.CELERY_DATABASE_URL_READER, echo=False)
+# Engines are created at import, before the worker forks: a pool would hand
+# inherited sockets (bound to the parent's event loop) to every child.
+# pgbouncer already pools server connections, so NullPool costs one cheap connect.
+# Batch jobs need a longer timeout than pgbouncer sets for the API, raised for
+# each of their (few, long) transactions.
+engine_writer = create_engine(
+    settings.CELERY_DATABASE_URL_WRITER,
+    pool=settings.CELERY_DB_POOL,
+    statement_timeout_ms=settings.CELERY_DB_STATEMENT_TIMEOUT_MS,
+    set_local_timeout=True,
+)
+engine_reader = create_engine(
+    settings.CELERY_DATABASE_URL_READER,
+    pool=settings.CELERY_DB_POOL,
+    statement_timeout_ms=settings.CELERY_DB_STATEMENT_TIMEOUT_MS,
+    set_local_timeout=True,
+)
 
 AsyncSessionLocalWriter = sessionmaker(
     bind=engine_writer, class_=AsyncSession, expire_on_commit=False
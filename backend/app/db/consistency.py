@@ -0,0 +1,131 @@
+import time
+from contextvars import ContextVar
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.requests import HTTPConnection
+from app.core.redis_client import get_redis_client
+from app.core.settings import settings
+
+# Last writer LSN per client, so the client's next requests can read it back too
+LSN_KEY_PREFIX = "read_your_writes:"
+
+# Cookies identifying a client, most specific first
+CLIENT_COOKIES = (
+    settings.ADMIN_SESSION_COOKIE_NAME,
+    "session_id",
+    settings.ANONYMOUS_SESSION_COOKIE_NAME,
+)
+
+# A fresh replica position is fetched at most this often while it is behind
+REPLICA_LSN_CACHE_SECONDS = 0.1
+
+
+def parse_lsn(value: str) -> int:
+    """`16/B374D848` -> absolute WAL position."""
+    high, low = value.split("/")
+    return (int(high, 16) << 32) + int(low, 16)
+
+
+class Consistency:
+    """
+    The newest writer LSN one request (and its client) must be able to read.
+    Reads go to the replica only once it has replayed up to this position, and
+    never once the request is `pinned` because that position is unknown.
+    Redis errors are only logged: they must not fail a read or a committed write.
+    """
+
+    def __init__(self, client: str | None = None):
+        self.client = client
+        self.lsn = 0
+        self.pinned = False
+        self._loaded = client is None
+
+    def pin(self):
+        """Send the rest of the request's reads to the writer."""
+        self.pinned = True
+
+    async def required_lsn(self) -> int:
+        if not self._loaded:
+            self._loaded = True
+            try:
+                redis = await get_redis_client()
+                stored = await redis.get(f"{LSN_KEY_PREFIX}{self.client}")
+            except Exception as e:
+                print(f"Read-your-writes lookup for {self.client} failed: {e}")
+                self.pin()
+            else:
+                if stored:
+                    self.lsn = max(self.lsn, int(stored))
+        return self.lsn
+
+    async def record(self, lsn: int):
+        self.lsn = max(self.lsn, lsn)
+        if self.client:
+            try:
+                redis = await get_redis_client()
+                await redis.set(
+                    f"{LSN_KEY_PREFIX}{self.client}",
+                    self.lsn,
+                    ex=settings.READ_YOUR_WRITES_TTL_SECONDS,
+                )
+            except Exception as e:
+                # This request still reads its write, the client's next ones may not
+                print(f"Read-your-writes record for {self.client} failed: {e}")
+
+
+_consistency: ContextVar[Consistency | None] = ContextVar("consistency", default=None)
+
+
+def current_consistency() -> Consistency | None:
+    return _consistency.get()
+
+
+class ReadYourWritesMiddleware:
+    """Give every HTTP request a Consistency keyed by the client's session cookie."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        cookies = HTTPConnection(scope).cookies
+        client = next(
+            (f"{name}:{cookies[name]}" for name in CLIENT_COOKIES if cookies.get(name)),
+            None,
+        )
+        token = _consistency.set(Consistency(client))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _consistency.reset(token)
+
+
+async def writer_lsn(engine: AsyncEngine) -> int:
+    async with engine.connect() as connection:
+        result = await connection.execute(text("SELECT pg_current_wal_lsn()::text"))
+        return parse_lsn(result.scalar_one())
+
+
+# Last replayed position seen per replica engine: (lsn, checked_at)
+_replayed: dict[AsyncEngine, tuple[int, float]] = {}
+
+
+async def replica_caught_up(engine: AsyncEngine, lsn: int) -> bool:
+    """Whether the replica behind `engine` has replayed the WAL up to `lsn`."""
+    replayed, checked_at = _replayed.get(engine, (0, 0.0))
+    if replayed >= lsn:
+        return True
+    if time.monotonic() - checked_at < REPLICA_LSN_CACHE_SECONDS:
+        return False
+
+    async with engine.connect() as connection:
+        result = await connection.execute(
+            text("SELECT pg_last_wal_replay_lsn()::text")
+        )
+        value = result.scalar_one()
+    # NULL when not in recovery: the "replica" is a primary (single database setups)
+    replayed = 1 << 64 if value is None else parse_lsn(value)
+    _replayed[engine] = (replayed, time.monotonic())
+    return replayed >= lsn
@@ -0,0 +1,79 @@
+import uuid
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from app.core.settings import settings
+
+POOLS = ("queue", "null")
+
+
+def create_engine(
+    url: str,
+    *,
+    pool: str | None = None,
+    pgbouncer: bool | None = None,
+    statement_timeout_ms: int = 0,
+    set_local_timeout: bool | None = None,
+    **overrides,
+) -> AsyncEngine:
+    """
+    Build an async engine from the DB_* settings.
+
+    `pool` is "queue" (a pool of DB_POOL_SIZE + DB_MAX_OVERFLOW connections) or
+    "null" (connect per checkout, for forked processes and short scripts).
+    With `pgbouncer`, asyncpg's statement caches are turned off and every prepared
+    statement gets a unique name: in transaction mode consecutive transactions may
+    run on different server connections, so a cached or named statement from one
+    would be missing (or clash) on the next.
+    `statement_timeout_ms` caps every statement run through the engine, 0 disables.
+    pgbouncer rejects it as a startup parameter, so behind pgbouncer it has to
+    be set server side (the `connect_query` of pgbouncer.ini, or ALTER ROLE ...
+    SET statement_timeout). `set_local_timeout` sets it at the start of every
+    transaction instead, which costs a round trip per transaction.
+    """
+    pool = pool or settings.DB_POOL
+    if pool not in POOLS:
+        raise ValueError(f"Unknown pool {pool}, expected one of {POOLS}")
+    if pgbouncer is None:
+        pgbouncer = settings.DB_PGBOUNCER
+    if set_local_timeout is None:
+        set_local_timeout = settings.DB_SET_LOCAL_TIMEOUT
+
+    options = {"echo": False, "pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if pool == "null":
+        options["poolclass"] = NullPool
+    else:
+        options.update(
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+
+    connect_args = {}
+    if pgbouncer:
+        connect_args.update(
+            statement_cache_size=0,
+            prepared_statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid.uuid4()}__",
+        )
+    elif statement_timeout_ms:
+        # Sent once per connection; pgbouncer rejects unknown startup parameters
+        connect_args["server_settings"] = {
+            "statement_timeout": str(statement_timeout_ms)
+        }
+    options["connect_args"] = connect_args
+    options.update(overrides)
+
+    engine = create_async_engine(url, **options)
+
+    if pgbouncer and set_local_timeout and statement_timeout_ms:
+        # Scoped to the transaction, so it never leaks to another client's
+        # transaction on the same server connection
+        @event.listens_for(engine.sync_engine, "begin")
+        def set_statement_timeout(connection):
+            connection.exec_driver_sql(
+                f"SET LOCAL statement_timeout = {int(statement_timeout_ms)}"
+            )
+
+    return engine
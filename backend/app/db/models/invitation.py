@@ -10,6 +10,7 @@ from sqlalchemy import (
     Text,
     Boolean,
     Computed,
+    JSON,
 )
 from sqlalchemy.orm import relationship, declared_attr
 from app.db.session import Base
@@ -65,11 +66,21 @@ class InvitationTemplateBase:
 
     @declared_attr
     def wallpaper(cls):
-        return Column(String, nullable=True)
+        return Column(String, nullable=True, index=True)
+
+    # Responsive variants of the wallpaper: size, placeholder and srcset sources
+    @declared_attr
+    def wallpaper_variants(cls):
+        return Column(JSON, nullable=True)
 
     @declared_attr
     def background_audio(cls):
-        return Column(String, nullable=True)
+        return Column(String, nullable=True, index=True)
+
+    # Duration, loudness gain and rendition URLs of the background audio
+    @declared_attr
+    def background_audio_meta(cls):
+        return Column(JSON, nullable=True)
 
     # Relationships
     @declared_attr
@@ -193,7 +204,8 @@ class SlideshowImage(Base):
     template_id = Column(Integer, ForeignKey("templates.id", ondelete="CASCADE"), nullable=True)
 
     slideshow_id = Column(Integer, ForeignKey("slideshows.id", ondelete="CASCADE"), nullable=False)
-    file_url = Column(String, nullable=False)
+    file_url = Column(String, nullable=False, index=True)
+    variants = Column(JSON, nullable=True)
     order = Column(Integer, default=0)
 
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -289,6 +301,7 @@ class Event(Base):
     def __str__(self):
         return self.title
 
+
 # -------------------- Invitation --------------------
 class Invitation(Base, InvitationTemplateBase):
     __tablename__ = "invitations"
@@ -297,7 +310,7 @@ class Invitation(Base, InvitationTemplateBase):
     status = Column(Enum(InvitationStatus), default=InvitationStatus.DRAFT)
 
     owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
-    anon_session_id = Column(String, nullable=True)
+    anon_session_id = Column(String, nullable=True, index=True)
 
     active_from = Column(DateTime, nullable=True)
     active_until = Column(DateTime, nullable=True)
@@ -315,3 +328,30 @@ class Invitation(Base, InvitationTemplateBase):
 
     def __str__(self):
         return self.title
+
+
+# -------------------- Archive --------------------
+class InvitationArchive(Base):
+    """An expired invitation moved to object storage before its rows were deleted."""
+
+    __tablename__ = "invitation_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # The invitation row is gone, the id is kept for support lookups
+    invitation_id = Column(Integer, nullable=False, unique=True)
+    owner_id = Column(
+        Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    title = Column(String, nullable=True)
+    slug = Column(String, nullable=True)
+    active_from = Column(DateTime, nullable=True)
+    active_until = Column(DateTime, nullable=True)
+    guest_count = Column(Integer, default=0)
+
+    # Gzipped JSON document in the media bucket
+    object_name = Column(String, nullable=False)
+    size = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
+
+    def __str__(self):
+        return f"Archive of invitation #{self.invitation_id}"
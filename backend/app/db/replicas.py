@@ -0,0 +1,197 @@
+import asyncio
+import time
+from dataclasses import dataclass
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.core.settings import settings
+from app.db.consistency import parse_lsn
+
+PROBE_QUERY = text(
+    """
+    SELECT pg_is_in_recovery() AS in_recovery,
+           pg_last_wal_replay_lsn()::text AS replay_lsn,
+           EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) AS replay_age
+    """
+)
+
+
+CONNECTION_ERRORS = (
+    OSError,
+    asyncio.TimeoutError,
+    asyncpg.PostgresConnectionError,
+    asyncpg.CannotConnectNowError,
+)
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """Whether `error` means the database could not be reached, not a bad query."""
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    if not isinstance(error, DBAPIError):
+        return False
+    if error.connection_invalidated or isinstance(
+        error, (OperationalError, InterfaceError)
+    ):
+        return True
+    # The asyncpg adapter wraps e.g. a replica down behind pgbouncer as a plain
+    # DBAPIError, not invalidated at connect time: look at what it wraps
+    cause = error.orig
+    while cause is not None:
+        if isinstance(cause, CONNECTION_ERRORS):
+            return True
+        cause = cause.__cause__
+    return False
+
+
+@dataclass(eq=False)
+class Replica:
+    name: str
+    engine: AsyncEngine
+    healthy: bool = True
+    lag_seconds: float = 0.0
+    lag_bytes: int = 0
+    consecutive_failures: int = 0
+    consecutive_successes: int = 0
+    failures_total: int = 0
+    last_error: str | None = None
+    probed_at: float = 0.0
+    sessions_total: int = 0
+
+    def _set_healthy(self, healthy: bool, reason: str):
+        if self.healthy != healthy:
+            self.healthy = healthy
+            state = "healthy" if healthy else "unhealthy"
+            print(f"Replica {self.name} marked {state}: {reason}")
+
+    def record_failure(self, error: BaseException):
+        """A probe or a request could not reach the replica."""
+        self.failures_total += 1
+        self.consecutive_successes = 0
+        self.consecutive_failures += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        if self.consecutive_failures >= settings.REPLICA_FAILURE_THRESHOLD:
+            self._set_healthy(False, self.last_error)
+
+    def record_probe(self, lag_seconds: float, lag_bytes: int):
+        self.lag_seconds = lag_seconds
+        self.lag_bytes = lag_bytes
+        self.probed_at = time.time()
+        self.consecutive_failures = 0
+        if lag_seconds > settings.REPLICA_MAX_LAG_SECONDS:
+            # Measured, not flaky: stale reads start now, no need to wait for a streak
+            self.consecutive_successes = 0
+            self._set_healthy(False, f"lagging {lag_seconds:.1f}s")
+            return
+        self.consecutive_successes += 1
+        if self.consecutive_successes >= settings.REPLICA_RECOVERY_PROBES:
+            self._set_healthy(True, f"lag {lag_seconds:.1f}s")
+
+
+class ReplicaSet:
+    """
+    Replicas in order of preference, with their health. Reads go to the first
+    healthy one, to the writer when none is.
+    """
+
+    def __init__(self, writer: AsyncEngine, replicas: list[Replica]):
+        self.writer = writer
+        self.replicas = replicas
+        self.writer_sessions_total = 0
+        self._task: asyncio.Task | None = None
+
+    def pick(self) -> Replica | None:
+        for replica in self.replicas:
+            if replica.healthy:
+                replica.sessions_total += 1
+                return replica
+        self.writer_sessions_total += 1
+        return None
+
+    async def _writer_lsn(self) -> int | None:
+        try:
+            async with self.writer.connect() as connection:
+                result = await connection.execute(
+                    text("SELECT pg_current_wal_lsn()::text")
+                )
+                return parse_lsn(result.scalar_one())
+        except Exception as e:
+            print(f"Writer LSN probe failed: {e}")
+            return None
+
+    async def _probe(self, replica: Replica, writer_lsn: int | None):
+        async with replica.engine.connect() as connection:
+            row = (await connection.execute(PROBE_QUERY)).one()
+
+        if not row.in_recovery:
+            # A primary answering on the reader URL (single database setups)
+            replica.record_probe(0.0, 0)
+            return
+
+        replayed = parse_lsn(row.replay_lsn) if row.replay_lsn else 0
+        lag_bytes = max(writer_lsn - replayed, 0) if writer_lsn is not None else 0
+        # The last replayed transaction's age only means lag while WAL is pending;
+        # on an idle primary it just grows
+        if writer_lsn is not None and lag_bytes == 0:
+            lag_seconds = 0.0
+        else:
+            lag_seconds = float(row.replay_age or 0.0)
+        replica.record_probe(lag_seconds, lag_bytes)
+
+    async def probe(self):
+        writer_lsn = await self._writer_lsn()
+        for replica in self.replicas:
+            try:
+                await asyncio.wait_for(
+                    self._probe(replica, writer_lsn),
+                    settings.REPLICA_PROBE_TIMEOUT_SECONDS,
+                )
+            except Exception as e:
+                replica.record_failure(e)
+
+    async def _run(self):
+        while True:
+            await self.probe()
+            await asyncio.sleep(settings.REPLICA_PROBE_INTERVAL_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def metrics(self) -> str:
+        """Prometheus text exposition of replica health and lag."""
+        series = [
+            ("db_replica_healthy", "gauge", "Whether reads are sent to the replica.",
+             lambda r: int(r.healthy)),
+            ("db_replica_lag_seconds", "gauge", "Replay lag at the last probe.",
+             lambda r: r.lag_seconds),
+            ("db_replica_lag_bytes", "gauge", "WAL not yet replayed at the last probe.",
+             lambda r: r.lag_bytes),
+            ("db_replica_probe_timestamp_seconds", "gauge",
+             "Time of the last successful probe.", lambda r: r.probed_at),
+            ("db_replica_failures_total", "counter", "Failed probes and connections.",
+             lambda r: r.failures_total),
+            ("db_replica_sessions_total", "counter",
+             "Read sessions sent to the replica.", lambda r: r.sessions_total),
+        ]
+        lines = []
+        for name, kind, help_text, value in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for replica in self.replicas:
+                lines.append(f'{name}{{replica="{replica.name}"}} {value(replica)}')
+        lines += [
+            "# HELP db_writer_read_sessions_total Read sessions sent to the writer.",
+            "# TYPE db_writer_read_sessions_total counter",
+            f"db_writer_read_sessions_total {self.writer_sessions_total}",
+        ]
+        return "\n".join(lines) + "\n"
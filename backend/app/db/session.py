@@ -1,19 +1,200 @@
 from app.core.settings import settings
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from app.db.consistency import current_consistency, replica_caught_up, writer_lsn
+from app.db.engine import create_engine
+from app.db.replicas import Replica, ReplicaSet, is_unavailable
+from app.services.cache import cache, entity_tags, table_tags
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+engine_writer = create_engine(
+    settings.DATABASE_URL_WRITER,
+    statement_timeout_ms=settings.DB_WRITER_STATEMENT_TIMEOUT_MS,
+)
+engine_reader = create_engine(
+    settings.DATABASE_URL_READER,
+    statement_timeout_ms=settings.DB_READER_STATEMENT_TIMEOUT_MS,
+)
+
+
+# -------------------- Read-your-writes routing --------------------
+class _WriterSyncSession(Session):
+    pass
+
+
+@event.listens_for(_WriterSyncSession, "after_flush")
+def _flushed(session, flush_context):
+    session.info["wrote"] = True
+    # Still the pre-flush state here
+    tags = session.info.setdefault("cache_tags", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        tags.update(entity_tags(obj))
+
+
+@event.listens_for(_WriterSyncSession, "do_orm_execute")
+def _bulk_dml(orm_execute_state):
+    if (
+        orm_execute_state.is_insert
+        or orm_execute_state.is_update
+        or orm_execute_state.is_delete
+    ):
+        session = orm_execute_state.session
+        session.info["wrote"] = True
+        # Rows aren't loaded: only the table's own tags (see TABLE_TAGS)
+        table = getattr(orm_execute_state.statement, "table", None)
+        if table is not None:
+            session.info.setdefault("cache_tags", set()).update(
+                table_tags(table.name)
+            )
+
+
+@event.listens_for(_WriterSyncSession, "after_rollback")
+def _rolled_back(session):
+    session.info.pop("wrote", None)
+    session.info.pop("cache_tags", None)
+
+
+class WriterSession(AsyncSession):
+    """
+    After committing changes, records the writer's WAL position for the request
+    and invalidates the cache tags of the rows it touched.
+    """
+
+    sync_session_class = _WriterSyncSession
+
+    async def commit(self):
+        await super().commit()
+        # Popped after: pending changes are only flushed by the commit itself
+        wrote = self.info.pop("wrote", False)
+        cache_tags = self.info.pop("cache_tags", None)
+        consistency = current_consistency()
+        if wrote and consistency is not None:
+            try:
+                lsn = await writer_lsn(engine_writer)
+            except Exception as e:
+                print(f"Writer LSN lookup after commit failed: {e}")
+                consistency.pin()
+            else:
+                await consistency.record(lsn)
+        if cache_tags:
+            await cache.invalidate(*cache_tags)
+
+
+# -------------------- Replica routing --------------------
+engine_reader_fallback = (
+    create_engine(
+        settings.DATABASE_URL_READER_FALLBACK,
+        statement_timeout_ms=settings.DB_READER_STATEMENT_TIMEOUT_MS,
+    )
+    if settings.DATABASE_URL_READER_FALLBACK
+    else None
+)
+
+replicas = ReplicaSet(
+    engine_writer,
+    [Replica("reader", engine_reader)]
+    + (
+        [Replica("reader_fallback", engine_reader_fallback)]
+        if engine_reader_fallback
+        else []
+    ),
+)
+
+
+class _ReplicaSyncSession(Session):
+    def get_bind(self, mapper=None, **kw):
+        if "replica" not in self.info:
+            return super().get_bind(mapper, **kw)
+        replica = self.info["replica"]
+        return (replica.engine if replica else engine_writer).sync_engine
+
+
+class ReplicaSession(AsyncSession):
+    """
+    Reads from the first healthy replica, or from the writer when none is.
+    Moves to the writer for the rest of the request when the replica can't be
+    reached, or when the request's client committed a change the replica has
+    not replayed yet (checked before every statement, so a commit made halfway
+    through a request is seen by the reads after it).
+    """
+
+    sync_session_class = _ReplicaSyncSession
+
+    async def _use_writer(self):
+        # Drops the replica connection; objects already loaded stay usable, detached
+        await self.close()
+        self.info["replica"] = None
+
+    async def _route(self) -> Replica | None:
+        if "replica" not in self.info:
+            self.info["replica"] = replicas.pick()
+        replica = self.info["replica"]
+        consistency = current_consistency()
+        if replica is None or consistency is None:
+            return replica
+
+        lsn = await consistency.required_lsn()
+        if consistency.pinned:
+            await self._use_writer()
+            return None
+        if lsn <= self.info.get("checked_lsn", 0):
+            return replica
+        try:
+            caught_up = await replica_caught_up(replica.engine, lsn)
+        except Exception as e:
+            if not is_unavailable(e):
+                raise
+            replica.record_failure(e)
+            caught_up = False
+        if caught_up:
+            self.info["checked_lsn"] = lsn
+            return replica
+        await self._use_writer()
+        return None
+
+    async def _read(self, method: str, *args, **kwargs):
+        replica = await self._route()
+        try:
+            return await getattr(super(), method)(*args, **kwargs)
+        except Exception as e:
+            if replica is None or not is_unavailable(e):
+                raise
+            # Reads are safe to repeat: retry once on the writer
+            replica.record_failure(e)
+            await self._use_writer()
+            return await getattr(super(), method)(*args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await self._read("execute", *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._read("scalar", *args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return await self._read("scalars", *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return await self._read("get", *args, **kwargs)
+
+    async def stream(self, *args, **kwargs):
+        return await self._read("stream", *args, **kwargs)
+
+    async def stream_scalars(self, *args, **kwargs):
+        return await self._read("stream_scalars", *args, **kwargs)
+
+    async def refresh(self, *args, **kwargs):
+        return await self._read("refresh", *args, **kwargs)
 
-engine_writer = create_async_engine(settings.DATABASE_URL_WRITER, echo=False)
-engine_reader = create_async_engine(settings.DATABASE_URL_READER, echo=False)
 
 AsyncSessionLocalWriter = sessionmaker(
     bind=engine_writer,
-    class_=AsyncSession,
+    class_=WriterSession,
     expire_on_commit=False,
 )
 
 AsyncSessionLocalReader = sessionmaker(
     bind=engine_reader,
-    class_=AsyncSession,
+    class_=ReplicaSession,
     expire_on_commit=False,
 )
 
@@ -21,12 +21,44 @@ from app.api.orders.orders import router as orders_router
 from app.api.blogs.blogs import router as blogs_router
 from app.api.sitemap import router as sitemap_router
 from app.api.home import router as home_router
+from app.api.metrics import router as metrics_router
 
 from app.admin import setup_admin
+from app.core.body_limit import BodySizeLimitMiddleware
+from app.core.settings import settings
+from app.db.consistency import ReadYourWritesMiddleware
+from app.db.session import replicas
+from app.services.cache import cache
+from app.services.s3.image_engine import image_engine
 
 app = FastAPI()
 
 
+@app.on_event("startup")
+async def start_replica_probe():
+    replicas.start()
+
+
+@app.on_event("startup")
+async def start_cache_listener():
+    cache.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_image_engine():
+    image_engine.shutdown()
+
+
+@app.on_event("shutdown")
+async def stop_replica_probe():
+    await replicas.stop()
+
+
+@app.on_event("shutdown")
+async def stop_cache_listener():
+    await cache.stop()
+
+
 class AdminAuthMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
         if request.url.path == "/admin/login":
@@ -42,6 +74,10 @@ class AdminAuthMiddleware(BaseHTTPMiddleware):
 
 
 # Middleware
+app.add_middleware(
+    BodySizeLimitMiddleware, max_bytes=settings.MAX_REQUEST_BODY_MB * 1024 * 1024
+)
+app.add_middleware(ReadYourWritesMiddleware)
 app.add_middleware(SessionMiddleware, secret_key="your-secret-key")
 app.add_middleware(
     CORSMiddleware,
@@ -57,6 +93,9 @@ app.include_router(home_router)
 # Sitemap
 app.include_router(sitemap_router)
 
+# Metrics
+app.include_router(metrics_router)
+
 # Users Routers
 app.include_router(users_router, prefix="/users", tags=["users"])
 app.include_router(social_router, prefix="/users", tags=["users"])
@@ -180,6 +180,38 @@ class SlideshowRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+# -------------------- Image variants --------------------
+class ImageSourceRead(BaseModel):
+    url: str
+    width: int
+    height: int
+    # MIME type, pick the best one the client supports (image/avif, image/webp)
+    type: Optional[str] = None
+
+
+class ImageVariantsRead(BaseModel):
+    width: int
+    height: int
+    placeholder: Optional[str] = None
+    sources: List[ImageSourceRead] = []
+
+
+# -------------------- Audio renditions --------------------
+class AudioRenditionRead(BaseModel):
+    url: str
+    type: str
+    bitrate: Optional[str] = None
+
+
+class AudioMetaRead(BaseModel):
+    duration: Optional[float] = None
+    loudness: Optional[float] = None
+    # Gain to apply so every track plays at the same loudness
+    gain_db: Optional[float] = None
+    # Cheapest first, play the first type the client supports
+    renditions: List[AudioRenditionRead] = []
+
+
 # -------------------- Slideshow Image --------------------
 class SlideshowImageBase(BaseModel):
     file_url: str
@@ -200,6 +232,7 @@ class SlideshowImageUpdate(BaseModel):
 
 class SlideshowImageRead(SlideshowImageBase):
     id: int
+    variants: Optional[ImageVariantsRead] = None
     created_at: datetime
     updated_at: datetime
     model_config = {"from_attributes": True}
@@ -284,6 +317,8 @@ class InvitationUpdate(InvitationBase):
 class InvitationRead(InvitationBase):
     id: int
     status: Optional[InvitationStatus]
+    wallpaper_variants: Optional[ImageVariantsRead] = None
+    background_audio_meta: Optional[AudioMetaRead] = None
     rsvp: RSVPInvitationRead
     events: List[EventRead] = []
     slideshow_images: List[SlideshowImageRead] = []
@@ -298,6 +333,60 @@ class ReadyToPurchaseResponse(BaseModel):
     missing: List[str] | None = None
 
 
+# -------------------- Direct uploads --------------------
+class StagedUploadKind(str, Enum):
+    WALLPAPER = "wallpaper"
+    SLIDE = "slide"
+    AUDIO = "audio"
+
+
+class StagedUploadCreate(BaseModel):
+    kind: StagedUploadKind
+    filename: str
+    content_type: str
+
+
+class StagedUploadRead(BaseModel):
+    # multipart/form-data POST of `fields` followed by the file
+    upload_url: str
+    fields: dict[str, str]
+    object_name: str
+    expires_in: int
+
+
+class StagedUploadComplete(BaseModel):
+    kind: StagedUploadKind
+    object_name: str
+
+
+class UploadJobRead(BaseModel):
+    id: str
+    kind: str
+    status: str
+    invitation_id: Optional[int] = None
+    template_id: Optional[int] = None
+    # 0..1 while a transcode runs, when the input duration is known
+    progress: Optional[float] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+# -------------------- Archive --------------------
+class InvitationArchiveRead(BaseModel):
+    id: int
+    invitation_id: int
+    title: Optional[str] = None
+    slug: Optional[str] = None
+    active_from: Optional[datetime] = None
+    active_until: Optional[datetime] = None
+    guest_count: int = 0
+    size: int
+    archived_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
 # -------------------- Template --------------------
 class TemplateBase(BaseModel):
     title: str
@@ -340,6 +429,8 @@ class TemplateUpdate(TemplateBase):
 class TemplateRead(TemplateBase):
     id: int
     status: Optional[TemplateStatus] = None
+    wallpaper_variants: Optional[ImageVariantsRead] = None
+    background_audio_meta: Optional[AudioMetaRead] = None
     created_at: datetime
     updated_at: datetime
     category: Optional[CategoryTemplateRead] = None
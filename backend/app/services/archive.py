@@ -0,0 +1,134 @@
+import asyncio
+import gzip
+import json
+from datetime import date, datetime
+from enum import Enum
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.invitation import (
+    Invitation,
+    InvitationArchive,
+    Event,
+    RSVP,
+    Guest,
+)
+from app.services.helpers import any_id
+from app.services.s3.base import S3Base
+
+ARCHIVE_PREFIX = "archives"
+# Bumped when the document layout changes, readers branch on it
+ARCHIVE_VERSION = 1
+ARCHIVE_CONTENT_TYPE = "application/gzip"
+
+
+def archive_object_name(invitation_id: int) -> str:
+    return f"{ARCHIVE_PREFIX}/{invitation_id}.json.gz"
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return str(value)
+
+
+async def _rows(session: AsyncSession, table, column, ids: list[int]) -> list[dict]:
+    # Core selects: plain dicts, nothing is loaded into the session's identity map
+    result = await session.execute(select(table).where(column == any_id(ids)))
+    return [dict(row) for row in result.mappings()]
+
+
+def _guest_tree(guests: list[dict]) -> list[dict]:
+    """Main guests with their sub guests nested, in creation order."""
+    by_id = {guest["id"]: {**guest, "sub_guests": []} for guest in guests}
+    tree = []
+    for guest in sorted(by_id.values(), key=lambda g: (g["created_at"], g["id"])):
+        main = by_id.get(guest["main_guest_id"])
+        if main:
+            main["sub_guests"].append(guest)
+        else:
+            tree.append(guest)
+    return tree
+
+
+async def archive_invitations(session: AsyncSession, ids: list[int]) -> int:
+    """
+    Write each published invitation in `ids` (its row, events, RSVP and guest
+    tree) as a gzipped JSON document to the media bucket and add its
+    InvitationArchive row. Drafts that never went live are not archived.
+    Does not commit: call before deleting the rows, in the same transaction,
+    so an invitation is never gone without its archive. Returns the count.
+    """
+    if not ids:
+        return 0
+
+    already = await session.execute(
+        select(InvitationArchive.invitation_id).where(
+            InvitationArchive.invitation_id == any_id(ids)
+        )
+    )
+    archived = set(already.scalars().all())
+
+    invitations = [
+        invitation
+        for invitation in await _rows(session, Invitation.__table__, Invitation.id, ids)
+        if invitation["active_from"] is not None and invitation["id"] not in archived
+    ]
+    if not invitations:
+        return 0
+
+    ids = [invitation["id"] for invitation in invitations]
+    rsvp_ids = [invitation["rsvp_id"] for invitation in invitations]
+    events = await _rows(session, Event.__table__, Event.invitation_id, ids)
+    rsvps = await _rows(session, RSVP.__table__, RSVP.id, rsvp_ids)
+    guests = await _rows(session, Guest.__table__, Guest.rsvp_id, rsvp_ids)
+
+    events_by_invitation: dict[int, list[dict]] = {}
+    for event in events:
+        events_by_invitation.setdefault(event["invitation_id"], []).append(event)
+    rsvps_by_id = {rsvp["id"]: rsvp for rsvp in rsvps}
+    guests_by_rsvp: dict[int, list[dict]] = {}
+    for guest in guests:
+        guests_by_rsvp.setdefault(guest["rsvp_id"], []).append(guest)
+
+    storage = S3Base()
+    now = datetime.utcnow()
+
+    async def store(invitation: dict) -> InvitationArchive:
+        invitation_guests = guests_by_rsvp.get(invitation["rsvp_id"], [])
+        document = {
+            "version": ARCHIVE_VERSION,
+            "archived_at": now,
+            "invitation": invitation,
+            "events": sorted(
+                events_by_invitation.get(invitation["id"], []),
+                key=lambda e: e["start_datetime"],
+            ),
+            "rsvp": rsvps_by_id.get(invitation["rsvp_id"]),
+            "guests": _guest_tree(invitation_guests),
+        }
+        data = await asyncio.to_thread(
+            gzip.compress,
+            json.dumps(document, default=_json_default, ensure_ascii=False).encode(),
+        )
+        object_name = archive_object_name(invitation["id"])
+        # Keys aren't content-addressed: a run that stored the document but
+        # didn't commit may have left an older one here
+        await storage._write_bytes(object_name, data, ARCHIVE_CONTENT_TYPE)
+        return InvitationArchive(
+            invitation_id=invitation["id"],
+            owner_id=invitation["owner_id"],
+            title=invitation["title"],
+            slug=invitation["slug"],
+            active_from=invitation["active_from"],
+            active_until=invitation["active_until"],
+            guest_count=len(invitation_guests),
+            object_name=object_name,
+            size=len(data),
+            archived_at=now,
+        )
+
+    # Uploads share the bounded S3 thread pool, so the whole batch can be queued
+    session.add_all(await asyncio.gather(*(store(i) for i in invitations)))
+    return len(invitations)
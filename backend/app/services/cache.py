@@ -0,0 +1,298 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable, TypeVar
+from app.core.redis_client import get_redis_client
+from app.core.settings import settings
+from app.services.singleflight import single_flight
+
+T = TypeVar("T")
+
+# Read-through cache for public catalog data: an in-process LRU in front of
+# Redis. Every entry carries tags naming what it was built from (`template:12`,
+# `catalog:fonts`, ...). Writes through WriterSession invalidate the tags of the
+# rows they touched (see entity_tags): the Redis entries are deleted and every
+# pod drops its local copies on the `cache_invalidations` pub/sub message.
+# Pub/sub is at-most-once, so local entries also live at most
+# CACHE_LOCAL_TTL_SECONDS and are cleared whenever the subscription reconnects.
+#
+# Every invalidation also bumps `cache_tag_version:{tag}`. A load reads the
+# versions of its tags before touching Postgres and is only stored in Redis
+# if they are unchanged, so a load racing an invalidation from another pod
+# can't put the old rows back for the whole ttl. Tags that depend on the loaded
+# value aren't known beforehand: those loads are fenced by ANY_TAG, bumped by
+# every invalidation.
+KEY_PREFIX = "cache:"
+TAG_KEY_PREFIX = "cache_tag:"
+VERSION_KEY_PREFIX = "cache_tag_version:"
+ANY_TAG = "*"
+CHANNEL = "cache_invalidations"
+RECONNECT_SECONDS = 1
+# Longer than any entry's ttl, so a tag never forgets a live entry
+TAG_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# KEYS: entry, fence versions..., tag sets...
+# ARGV: value, ttl, fence count, expected versions ("" when none)..., key, tag ttl
+STORE_IF_CURRENT = """
+local fences = tonumber(ARGV[3])
+for i = 1, fences do
+    if (redis.call('GET', KEYS[1 + i]) or '') ~= ARGV[3 + i] then
+        return 0
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 2 + fences, #KEYS do
+    redis.call('SADD', KEYS[i], ARGV[4 + fences])
+    redis.call('EXPIRE', KEYS[i], ARGV[5 + fences])
+end
+return 1
+"""
+
+# Tags invalidated when rows of the table change: the table's own, which bulk
+# UPDATE/DELETE statements emit too, and the ones derived from a loaded row.
+# Bulk statements don't load their rows, so row tags (`template:{id}`) must be
+# invalidated explicitly after them.
+TABLE_TAGS: dict[str, tuple[tuple[str, ...], Callable[[Any], Iterable[str]] | None]] = {
+    "templates": (("templates",), lambda row: (f"template:{row.id}",)),
+    "slideshow_images": (
+        (),
+        lambda row: (f"template:{row.template_id}",) if row.template_id else (),
+    ),
+    "fonts": (("catalog:fonts",), None),
+    "games": (("catalog:games",), None),
+    "slideshows": (("catalog:slideshows",), None),
+    "categories": (("catalog:categories",), None),
+    "subcategories": (("catalog:categories",), None),
+    "subcategory_variants": (("catalog:categories",), None),
+    "blog_posts": (("blogposts",), None),
+}
+
+# What a serialised template embeds besides its own row
+TEMPLATE_TAGS = (
+    "catalog:categories",
+    "catalog:fonts",
+    "catalog:games",
+    "catalog:slideshows",
+)
+
+
+def table_tags(table_name: str | None) -> tuple[str, ...]:
+    return TABLE_TAGS.get(table_name, ((), None))[0]
+
+
+def entity_tags(obj) -> tuple[str, ...]:
+    table_name = getattr(obj, "__tablename__", None)
+    row_tags = TABLE_TAGS.get(table_name, ((), None))[1]
+    return (*table_tags(table_name), *(row_tags(obj) if row_tags else ()))
+
+
+def _resolve(tags, value) -> tuple[str, ...]:
+    return tuple(tags(value) if callable(tags) else tags)
+
+
+class LocalCache:
+    """LRU with per-entry expiry and a tag index, for one process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        # Bumped by every invalidation: loads started before it aren't stored
+        self.generation = 0
+        self._entries: OrderedDict[str, tuple[float, Any, tuple[str, ...]]] = (
+            OrderedDict()
+        )
+        self._tagged: dict[str, set[str]] = {}
+
+    def get(self, key: str) -> tuple[bool, Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            return False, None
+        self._entries.move_to_end(key)
+        return True, value
+
+    def set(self, key: str, value, ttl: float, tags: tuple[str, ...]):
+        self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, value, tags)
+        for tag in tags:
+            self._tagged.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def invalidate(self, tags: Iterable[str]):
+        self.generation += 1
+        for tag in tags:
+            for key in list(self._tagged.get(tag, ())):
+                self._remove(key)
+
+    def clear(self):
+        self.generation += 1
+        self._entries.clear()
+        self._tagged.clear()
+
+
+class Cache:
+    def __init__(self):
+        self.local = LocalCache(settings.CACHE_LOCAL_MAX_ENTRIES)
+        self._task: asyncio.Task | None = None
+
+    async def _store(
+        self,
+        key: str,
+        raw: str,
+        ttl: int,
+        tags: tuple[str, ...],
+        fence: tuple[str, ...],
+        versions: list[str | None],
+    ) -> bool:
+        redis = await get_redis_client()
+        stored = await redis.eval(
+            STORE_IF_CURRENT,
+            1 + len(fence) + len(tags),
+            f"{KEY_PREFIX}{key}",
+            *(f"{VERSION_KEY_PREFIX}{tag}" for tag in fence),
+            *(f"{TAG_KEY_PREFIX}{tag}" for tag in tags),
+            raw,
+            ttl,
+            len(fence),
+            *(version or "" for version in versions),
+            key,
+            TAG_TTL_SECONDS,
+        )
+        return bool(stored)
+
+    async def get_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[T]],
+        *,
+        ttl: int,
+        tags: Iterable[str] | Callable[[T], Iterable[str]],
+        encode: Callable[[T], str] = json.dumps,
+        decode: Callable[[str], T] = json.loads,
+    ) -> T:
+        """
+        The cached value of `key`, loading (once across pods) and storing it on
+        a miss. `tags` may depend on the loaded value. Values are shared between
+        callers and must not be mutated. Redis errors only cost a load.
+        """
+        hit, value = self.local.get(key)
+        if hit:
+            return value
+
+        generation = self.local.generation
+        local_ttl = min(ttl, settings.CACHE_LOCAL_TTL_SECONDS)
+        fence = (ANY_TAG,) if callable(tags) else tuple(tags)
+        try:
+            redis = await get_redis_client()
+            raw, *versions = await redis.mget(
+                f"{KEY_PREFIX}{key}",
+                *(f"{VERSION_KEY_PREFIX}{tag}" for tag in fence),
+            )
+        except Exception as e:
+            print(f"Cache lookup of {key} failed: {e}")
+            return await load()
+
+        if raw is not None:
+            value = decode(raw)
+            if self.local.generation == generation:
+                self.local.set(key, value, local_ttl, _resolve(tags, value))
+            return value
+
+        async def load_and_store():
+            value = await load()
+            try:
+                await self._store(
+                    key, encode(value), ttl, _resolve(tags, value), fence, versions
+                )
+            except Exception as e:
+                print(f"Cache store of {key} failed: {e}")
+            return value
+
+        value = await single_flight(
+            f"{KEY_PREFIX}{key}", load_and_store, encode=encode, decode=decode
+        )
+        if self.local.generation == generation:
+            self.local.set(key, value, local_ttl, _resolve(tags, value))
+        return value
+
+    async def _invalidate(self, tags: set[str]):
+        redis = await get_redis_client()
+        tag_keys = [f"{TAG_KEY_PREFIX}{tag}" for tag in tags]
+        async with redis.pipeline(transaction=False) as pipeline:
+            # Versions first: a fenced load can no longer store once the tag
+            # sets are read, so nothing is added behind the DEL below
+            for tag in (*tags, ANY_TAG):
+                pipeline.incr(f"{VERSION_KEY_PREFIX}{tag}")
+                pipeline.expire(f"{VERSION_KEY_PREFIX}{tag}", TAG_TTL_SECONDS)
+            for tag_key in tag_keys:
+                pipeline.smembers(tag_key)
+            results = await pipeline.execute()
+        members = results[2 * (len(tags) + 1) :]
+        keys = {f"{KEY_PREFIX}{key}" for tagged in members for key in tagged}
+        await redis.delete(*keys, *tag_keys)
+        await redis.publish(CHANNEL, json.dumps(sorted(tags)))
+
+    async def invalidate(self, *tags: str):
+        """
+        Drop every entry tagged with one of `tags`, here, in Redis and (through
+        pub/sub) in the other pods. Call after the change has been committed.
+        """
+        tags = {tag for tag in tags if tag}
+        if not tags:
+            return
+        self.local.invalidate(tags)
+        try:
+            await self._invalidate(tags)
+        except Exception as e:
+            print(f"Failed to invalidate cache tags {sorted(tags)}: {e}")
+
+    async def _listen(self):
+        redis = await get_redis_client()
+        async with redis.pubsub() as pubsub:
+            await pubsub.subscribe(CHANNEL)
+            # Whatever was published while unsubscribed is lost
+            self.local.clear()
+            async for message in pubsub.listen():
+                if message["type"] == "message":
+                    self.local.invalidate(json.loads(message["data"]))
+
+    async def _run(self):
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Cache invalidation listener failed: {e}")
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+cache = Cache()
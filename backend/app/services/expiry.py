@@ -0,0 +1,31 @@
+from datetime import datetime, timezone
+from app.core.redis_client import get_redis_client
+
+# Sorted set of invitation ids scored by active_until (unix seconds, UTC)
+EXPIRY_QUEUE_KEY = "invitations:expiry"
+
+
+def _timestamp(moment: datetime) -> float:
+    # active_until is stored as naive UTC
+    return moment.replace(tzinfo=timezone.utc).timestamp()
+
+
+async def schedule_expiry(invitation_id: int, active_until: datetime):
+    """Queue (or move) an activated invitation's expiry."""
+    redis = await get_redis_client()
+    await redis.zadd(EXPIRY_QUEUE_KEY, {str(invitation_id): _timestamp(active_until)})
+
+
+async def due_expiries(now: datetime, limit: int) -> list[int]:
+    """Ids of the invitations whose expiry is due, oldest first."""
+    redis = await get_redis_client()
+    ids = await redis.zrangebyscore(
+        EXPIRY_QUEUE_KEY, "-inf", _timestamp(now), start=0, num=limit
+    )
+    return [int(invitation_id) for invitation_id in ids]
+
+
+async def clear_expiries(invitation_ids: list[int]):
+    if invitation_ids:
+        redis = await get_redis_client()
+        await redis.zrem(EXPIRY_QUEUE_KEY, *(str(i) for i in invitation_ids))
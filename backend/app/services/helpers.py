@@ -2,7 +2,8 @@ from urllib.parse import urlencode
 from datetime import datetime
 import secrets
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import Integer, any_, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY
 from app.db.models.invitation import Invitation
 import re
 import random
@@ -23,6 +24,11 @@ async def generate_slug(db: AsyncSession, length: int = SLUG_LENGTH) -> str:
             return slug
 
 
+def any_id(ids: list[int]):
+    """`= ANY(:ids)`: one array parameter instead of an IN list per batch size."""
+    return any_(literal(ids, ARRAY(Integer)))
+
+
 def generate_template_slug(title: str, suffix_length: int = 6) -> str:
     text = title.lower()
     text = re.sub(r"[^\w\d]+", "-", text, flags=re.UNICODE)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from fastapi import Request, Response
+from sqlalchemy import String, Text, cast, func, literal_column, select
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.invitation import (
+    Invitation,
+    RSVP,
+    Event,
+    SlideshowImage,
+    Game,
+    Slideshow,
+    Font,
+)
+
+# The InvitationRead payload built by Postgres in one query: related rows are
+# nested with correlated json_agg/json_build_object subqueries instead of
+# selectinload round trips, and the result is never hydrated into ORM objects.
+# Keep the keys in sync with app.schemas.invitation.InvitationRead.
+
+
+def _json_object(**fields):
+    args = []
+    for key, value in fields.items():
+        args += [literal_column(f"'{key}'"), value]
+    return func.json_build_object(*args)
+
+
+def _columns(*columns):
+    return {column.key: column for column in columns}
+
+
+def _one(condition, *columns):
+    """The related row matching `condition` as a JSON object, or null."""
+    return (
+        select(_json_object(**_columns(*columns)))
+        .where(condition)
+        .limit(1)
+        .scalar_subquery()
+    )
+
+
+def _many(condition, *columns, order_by):
+    """The related rows matching `condition` as a JSON array, [] when none."""
+    row = _json_object(**_columns(*columns))
+    return func.coalesce(
+        select(func.json_agg(aggregate_order_by(row, order_by)))
+        .where(condition)
+        .scalar_subquery(),
+        literal_column("'[]'::json"),
+    )
+
+
+def invitation_document():
+    """JSON expression of the current `invitations` row in the InvitationRead shape."""
+    null = literal_column("NULL")
+    return _json_object(
+        **_columns(
+            Invitation.id,
+            Invitation.title,
+            Invitation.slug,
+            Invitation.description,
+            Invitation.extra_info,
+            Invitation.selected_game,
+            Invitation.selected_slideshow,
+            Invitation.selected_font,
+            Invitation.primary_color,
+            Invitation.secondary_color,
+            Invitation.wallpaper,
+            Invitation.wallpaper_variants,
+            Invitation.background_audio,
+            Invitation.background_audio_meta,
+            Invitation.owner_id,
+            Invitation.anon_session_id,
+            Invitation.active_from,
+            Invitation.active_until,
+            Invitation.is_active,
+            Invitation.created_at,
+            Invitation.updated_at,
+        ),
+        # Stored by enum name, served by value
+        status=func.lower(cast(Invitation.status, String)),
+        category_id=null,
+        subcategory_id=null,
+        template_id=null,
+        selected_game_obj=_one(
+            Game.key == Invitation.selected_game,
+            Game.id,
+            Game.name,
+            Game.key,
+            Game.presentation_image,
+        ),
+        selected_slideshow_obj=_one(
+            Slideshow.key == Invitation.selected_slideshow,
+            Slideshow.id,
+            Slideshow.name,
+            Slideshow.key,
+            Slideshow.presentation_image,
+        ),
+        font_obj=_one(
+            Font.value == Invitation.selected_font,
+            Font.id,
+            Font.label,
+            Font.value,
+            Font.font_family,
+            Font.font_url,
+        ),
+        rsvp=_one(RSVP.id == Invitation.rsvp_id, RSVP.id, RSVP.ask_menu),
+        events=_many(
+            Event.invitation_id == Invitation.id,
+            Event.id,
+            Event.title,
+            Event.start_datetime,
+            Event.finish_datetime,
+            Event.location,
+            Event.description,
+            Event.calendar_link,
+            Event.location_link,
+            order_by=Event.id,
+        ),
+        slideshow_images=_many(
+            SlideshowImage.invitation_id == Invitation.id,
+            SlideshowImage.id,
+            SlideshowImage.file_url,
+            SlideshowImage.variants,
+            SlideshowImage.order,
+            SlideshowImage.slideshow_id,
+            SlideshowImage.invitation_id,
+            SlideshowImage.template_id,
+            SlideshowImage.created_at,
+            SlideshowImage.updated_at,
+            order_by=SlideshowImage.id,
+        ),
+    )
+
+
+@dataclass
+class InvitationDocument:
+    # Access control and caching fields, next to the serialised document
+    id: int
+    slug: str | None
+    owner_id: int | None
+    anon_session_id: str | None
+    is_active: bool
+    active_until: datetime | None
+    body: str
+
+    @property
+    def etag(self) -> str:
+        return f'"{hashlib.sha256(self.body.encode()).hexdigest()[:32]}"'
+
+    def data(self) -> dict:
+        return json.loads(self.body)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), default=datetime.isoformat)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "InvitationDocument":
+        fields = json.loads(raw)
+        if fields["active_until"]:
+            fields["active_until"] = datetime.fromisoformat(fields["active_until"])
+        return cls(**fields)
+
+    def response(self, request: Request | None = None) -> Response:
+        """
+        The document as the response body, skipping response_model validation.
+        With `request`, answers a matching If-None-Match with 304.
+        """
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if request and request.headers.get("if-none-match") == self.etag:
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=self.body, media_type="application/json", headers=headers
+        )
+
+
+async def load_invitation_document(db: AsyncSession, *where) -> InvitationDocument | None:
+    """Load the invitation matching `where` as an InvitationRead JSON document."""
+    result = await db.execute(
+        select(
+            Invitation.id,
+            Invitation.slug,
+            Invitation.owner_id,
+            Invitation.anon_session_id,
+            Invitation.is_active,
+            Invitation.active_until,
+            cast(invitation_document(), Text).label("body"),
+        ).where(*where)
+    )
+    row = result.first()
+    if row is None:
+        return None
+    return InvitationDocument(
+        id=row.id,
+        slug=row.slug,
+        owner_id=row.owner_id,
+        anon_session_id=row.anon_session_id,
+        is_active=bool(row.is_active),
+        active_until=row.active_until,
+        body=row.body,
+    )
@@ -0,0 +1,61 @@
+import json
+import uuid
+from datetime import datetime
+from starlette.concurrency import run_in_threadpool
+from app.core.redis_client import get_redis_client
+
+JOB_KEY_PREFIX = "media_job:"
+JOB_TTL_SECONDS = 24 * 60 * 60
+
+
+class JobStatus:
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+async def create_job(kind: str, **meta) -> str:
+    """Register a background media job and return its id."""
+    job_id = uuid.uuid4().hex
+    now = datetime.utcnow().isoformat()
+    job = {
+        "id": job_id,
+        "kind": kind,
+        "status": JobStatus.PENDING,
+        "created_at": now,
+        "updated_at": now,
+        **meta,
+    }
+    redis = await get_redis_client()
+    await redis.set(f"{JOB_KEY_PREFIX}{job_id}", json.dumps(job), ex=JOB_TTL_SECONDS)
+    return job_id
+
+
+async def update_job(job_id: str, **fields) -> dict | None:
+    redis = await get_redis_client()
+    key = f"{JOB_KEY_PREFIX}{job_id}"
+    raw = await redis.get(key)
+    if not raw:
+        return None
+    job = json.loads(raw)
+    job.update(fields, updated_at=datetime.utcnow().isoformat())
+    await redis.set(key, json.dumps(job), ex=JOB_TTL_SECONDS)
+    return job
+
+
+async def get_job(job_id: str) -> dict | None:
+    redis = await get_redis_client()
+    raw = await redis.get(f"{JOB_KEY_PREFIX}{job_id}")
+    return json.loads(raw) if raw else None
+
+
+async def queue_job(task_name: str, kind: str, **meta) -> dict:
+    """Create a job and hand its id to the Celery task `task_name`. Returns the job."""
+    # Imported here: celery_app imports the task modules, which import this one
+    from app.celery_app import celery_app
+
+    job_id = await create_job(kind, **meta)
+    # send_task talks to the broker synchronously
+    await run_in_threadpool(celery_app.send_task, task_name, args=[job_id])
+    return await get_job(job_id)
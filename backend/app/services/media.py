@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db.models.invitation import (
+    Invitation,
+    Template,
+    SlideshowImage,
+    Game,
+    Slideshow,
+)
+from app.db.models.user import User
+from app.db.models.blog import BlogPost
+from app.core.settings import settings
+from app.services.s3.base import S3Base
+from app.services.s3.staging import STAGING_PREFIX
+
+# Every column that can point at an object in the media bucket.
+# Invitations created from a template share the template's files and uploads are
+# content-addressed (identical bytes -> same object), so an object may only be
+# removed from storage once none of these columns reference it.
+MEDIA_COLUMNS = [
+    Invitation.wallpaper,
+    Invitation.background_audio,
+    Template.wallpaper,
+    Template.background_audio,
+    SlideshowImage.file_url,
+    User.profile_picture,
+    Game.presentation_image,
+    Slideshow.presentation_image,
+    BlogPost.image,
+]
+
+
+async def referenced_urls(db: AsyncSession, urls) -> set[str]:
+    """Return the subset of `urls` still referenced by at least one row."""
+    urls = {url for url in urls if url}
+    if not urls:
+        return set()
+
+    query = union(
+        *(select(column.label("url")).where(column.in_(urls)) for column in MEDIA_COLUMNS)
+    )
+    result = await db.execute(query)
+    return set(result.scalars().all())
+
+
+async def release_media(db: AsyncSession, urls) -> list[str]:
+    """
+    Delete the objects behind `urls` that nothing references any more.
+    Call after the change dropping the references has been committed.
+    Objects written or deduplicated against within MEDIA_GC_GRACE_HOURS are
+    left to collect_garbage: an upload sharing them may not be committed yet.
+    Returns the URLs that were removed from storage.
+    """
+    urls = {url for url in urls if url}
+    if not urls:
+        return []
+
+    storage = S3Base()
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=settings.MEDIA_GC_GRACE_HOURS)
+    unreferenced = sorted(urls - await referenced_urls(db, urls))
+    object_names = {url: storage._object_name(url) for url in unreferenced}
+    last_modified = await storage._last_modified_many(
+        name for name in object_names.values() if name
+    )
+    orphaned = []
+    for url in unreferenced:
+        modified = last_modified.get(object_names[url])
+        if modified and modified > cutoff:
+            continue
+        orphaned.append(url)
+    if orphaned:
+        await storage._delete_urls(orphaned)
+
+    return orphaned
+
+
+async def discard_uploads(db: AsyncSession, urls, created_urls) -> list[str]:
+    """
+    Undo the uploads of a request that failed before committing its rows.
+    The objects it wrote itself (`created_urls`) are deleted right away unless
+    something references them; the grace period of release_media would keep
+    them until collect_garbage. Deduplicated ones go through release_media,
+    other uploads may be about to commit a reference to them.
+    Returns the URLs that were removed from storage.
+    """
+    created = {url for url in created_urls if url}
+    fresh = sorted(created - await referenced_urls(db, created))
+    if fresh:
+        await S3Base()._delete_urls(fresh)
+
+    reused = {url for url in urls if url} - created
+    return [*fresh, *await release_media(db, reused)]
+
+
+# -------------------- Garbage collection --------------------
+# Folders uploads are stored under
+MEDIA_PREFIXES = [
+    "wallpapers/",
+    "slides/",
+    "music/",
+    "profile-images/",
+    "presentation_images/",
+]
+
+
+def object_stem(object_name: str) -> str:
+    """
+    `folder/{id}` of a key. Variants and renditions are stored as
+    `folder/{id}.{suffix}.{ext}` and live exactly as long as `folder/{id}.{ext}`.
+    """
+    folder, _, name = object_name.rpartition("/")
+    stem = name.split(".", 1)[0]
+    return f"{folder}/{stem}" if folder else stem
+
+
+async def referenced_stems(db: AsyncSession, storage: S3Base) -> set[str]:
+    """Stems of every object some media column points at."""
+    query = union(
+        *(select(column.label("url")).where(column.is_not(None)) for column in MEDIA_COLUMNS)
+    )
+    stems = set()
+    result = await db.stream_scalars(query)
+    async for url in result:
+        object_name = storage._object_name(url)
+        if object_name:
+            stems.add(object_stem(object_name))
+    return stems
+
+
+async def collect_garbage(db: AsyncSession, dry_run: bool = False) -> dict:
+    """
+    Delete stored objects no row references any more: leftovers of failed
+    deletes, rolled back uploads and URLs `_delete` could not parse.
+    Objects younger than MEDIA_GC_GRACE_HOURS are kept (their row may not be
+    committed yet), staged uploads go after MEDIA_GC_STAGING_MAX_AGE_HOURS.
+    Returns a report of what was (or, with `dry_run`, would be) reclaimed.
+    """
+    storage = S3Base()
+    now = datetime.now(timezone.utc)
+    grace = timedelta(hours=settings.MEDIA_GC_GRACE_HOURS)
+    staging_max_age = timedelta(hours=settings.MEDIA_GC_STAGING_MAX_AGE_HOURS)
+
+    # List before reading the references: an object uploaded and referenced
+    # in between is then seen as referenced, never as an orphan
+    listed = {prefix: await storage._list_objects(prefix) for prefix in MEDIA_PREFIXES}
+    staged = await storage._list_objects(f"{STAGING_PREFIX}/")
+    referenced = await referenced_stems(db, storage)
+
+    # A deduplicated upload refreshes its objects one by one: a stem is kept
+    # whole while any of its objects is recent
+    recent = {
+        object_stem(obj.object_name)
+        for objects in listed.values()
+        for obj in objects
+        if now - obj.last_modified <= grace
+    }
+
+    report = {"dry_run": dry_run, "prefixes": {}}
+    orphans = []
+    for prefix, objects in {**listed, f"{STAGING_PREFIX}/": staged}.items():
+        if prefix.startswith(STAGING_PREFIX):
+            found = [obj for obj in objects if now - obj.last_modified > staging_max_age]
+        else:
+            found = [
+                obj
+                for obj in objects
+                if object_stem(obj.object_name) not in referenced
+                and object_stem(obj.object_name) not in recent
+            ]
+        orphans.extend(found)
+        report["prefixes"][prefix] = {
+            "scanned": len(objects),
+            "orphaned": len(found),
+            "bytes": sum(obj.size or 0 for obj in found),
+        }
+
+    deleted, failed = 0, []
+    if not dry_run:
+        result = await storage._delete_many(obj.object_name for obj in orphans)
+        deleted, failed = len(result.deleted), result.failed
+
+    report.update(
+        scanned=sum(p["scanned"] for p in report["prefixes"].values()),
+        orphaned=len(orphans),
+        bytes=sum(p["bytes"] for p in report["prefixes"].values()),
+        deleted=deleted,
+        failed=failed,
+    )
+    return report
@@ -1,10 +1,38 @@
 from minio import Minio
+from minio.commonconfig import REPLACE, CopySource
+from minio.datatypes import PostPolicy
+from minio.deleteobjects import DeleteObject
 from minio.error import S3Error
 from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
 from app.core.settings import settings
-import uuid
-from fastapi import UploadFile
+import asyncio
+import functools
+import hashlib
 import io
+import json
+import tempfile
+import certifi
+import urllib3
+from fastapi import UploadFile
+
+# Shared connection pool: every S3Base instance in the process reuses these sockets
+http_client = urllib3.PoolManager(
+    timeout=urllib3.Timeout(
+        connect=settings.S3_CONNECT_TIMEOUT, read=settings.S3_READ_TIMEOUT
+    ),
+    maxsize=settings.S3_MAX_CONCURRENCY,
+    block=True,
+    cert_reqs="CERT_REQUIRED",
+    ca_certs=certifi.where(),
+    retries=urllib3.Retry(
+        total=settings.S3_MAX_RETRIES,
+        backoff_factor=0.2,
+        status_forcelist=[500, 502, 503, 504],
+    ),
+)
 
 minio_client = Minio(
     endpoint="minio.local:9000",
@@ -12,8 +40,70 @@ minio_client = Minio(
     secret_key=settings.S3_SECRET_KEY,
     secure=settings.S3_SECURE,
     region=settings.S3_REGION,
+    http_client=http_client,
+)
+
+# Signs URLs for the public endpoint; signing is local, the region is pinned so
+# the SDK never has to look it up over the network
+presign_client = Minio(
+    endpoint=settings.S3_PUBLIC_ENDPOINT,
+    access_key=settings.S3_ACCESS_KEY,
+    secret_key=settings.S3_SECRET_KEY,
+    secure=settings.S3_SECURE,
+    region=settings.S3_REGION or "us-east-1",
+)
+
+# The MinIO SDK is blocking, so calls run here instead of on the event loop.
+# Sized like the connection pool, so no call ever waits on a socket while holding a thread.
+s3_executor = ThreadPoolExecutor(
+    max_workers=settings.S3_MAX_CONCURRENCY, thread_name_prefix="s3"
+)
+
+# Uploads are read in chunks of this size; bodies above SPOOL_MAX_MEMORY go to disk
+CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_MEMORY = 2 * 1024 * 1024
+# Objects larger than one part are sent with a multipart upload
+PART_SIZE = 5 * 1024 * 1024
+# Keys per multi-object delete request (the S3 maximum)
+DELETE_BATCH_SIZE = 1000
+# Attempts per key when a key fails inside a multi-object delete
+DELETE_RETRIES = 3
+
+# A deduplicated object is refreshed once it is older than this, which leaves it
+# at least as long again before a delete may take it (see _refresh_if_exists)
+REFRESH_AFTER = timedelta(hours=settings.MEDIA_GC_GRACE_HOURS) / 2
+# Headers an object keeps when it is copied onto itself, besides x-amz-meta-*
+KEPT_HEADERS = (
+    "cache-control",
+    "content-disposition",
+    "content-encoding",
+    "content-language",
+    "content-type",
 )
 
+# Buckets already checked/created by this process
+_ready_buckets: set[str] = set()
+_bucket_lock = asyncio.Lock()
+
+
+@dataclass
+class DeleteResult:
+    """Outcome of `_delete_many`: removed keys and the keys that kept failing."""
+
+    deleted: list[str] = field(default_factory=list)
+    # {"key", "code", "message", "attempts"} per key
+    failed: list[dict] = field(default_factory=list)
+
+
+@dataclass
+class StoredImage:
+    """An uploaded image and the srcset metadata of its stored variants."""
+
+    url: str
+    variants: dict | None = None
+    # Written by this upload, not deduplicated against an object already stored
+    created: bool = False
+
 
 # ----------------------------
 # S3 Base Class
@@ -22,47 +112,332 @@ class S3Base:
     def __init__(self, bucket: str = settings.S3_BUCKET):
         self.bucket = bucket
         self.client = minio_client
-        # Create bucket if it doesn't exist (skip errors in prod)
-        if not self.client.bucket_exists(bucket):
-            try:
-                self.client.make_bucket(bucket)
-            except S3Error as e:
-                print(f"Bucket creation skipped: {e}")
+
+    async def _run(self, fn, *args, **kwargs):
+        """Run a blocking MinIO call on the shared S3 thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            s3_executor, functools.partial(fn, *args, **kwargs)
+        )
+
+    async def _ensure_bucket(self):
+        """Check the bucket once per process instead of once per service instance."""
+        if self.bucket in _ready_buckets:
+            return
+
+        async with _bucket_lock:
+            if self.bucket in _ready_buckets:
+                return
+            # Create bucket if it doesn't exist (skip errors in prod)
+            if not await self._run(self.client.bucket_exists, self.bucket):
+                try:
+                    await self._run(self.client.make_bucket, self.bucket)
+                except S3Error as e:
+                    print(f"Bucket creation skipped: {e}")
+            _ready_buckets.add(self.bucket)
+
+    async def _ingest(self, file: UploadFile, max_size_mb=None):
+        """
+        Read an upload in chunks into a spooled temp file, hashing as it goes.
+        Rejects the file as soon as it grows past max_size_mb, so it is never
+        copied whole or sent to storage; the request body itself is bounded by
+        BodySizeLimitMiddleware. Returns (spool, size, sha256 hex).
+        """
+        limit = max_size_mb * 1024 * 1024 if max_size_mb else None
+
+        # Cheap early exit when the size is already known from the request
+        known_size = getattr(file, "size", None)
+        if limit and known_size and known_size > limit:
+            raise ValueError(
+                f"File size {known_size / (1024 * 1024):.2f}MB exceeds max allowed {max_size_mb}MB"
+            )
+
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            while chunk := await file.read(CHUNK_SIZE):
+                size += len(chunk)
+                if limit and size > limit:
+                    raise ValueError(
+                        f"File size exceeds max allowed {max_size_mb}MB"
+                    )
+                digest.update(chunk)
+                spool.write(chunk)
+        except BaseException:
+            spool.close()
+            raise
+
+        spool.seek(0)
+        return spool, size, digest.hexdigest()
 
     async def _upload(
         self, file: UploadFile, folder: str = "", allowed_types=None, max_size_mb=None
     ) -> str:
+        url, _ = await self._store_upload(
+            file, folder, allowed_types=allowed_types, max_size_mb=max_size_mb
+        )
+        return url
+
+    async def _store_upload(
+        self, file: UploadFile, folder: str = "", allowed_types=None, max_size_mb=None
+    ) -> tuple[str, bool]:
+        """`_upload`, also telling whether the object was written by this call."""
         # Validate content type
         if allowed_types and file.content_type not in allowed_types:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        # Read file data
-        data = await file.read()
-        size_mb = len(data) / (1024 * 1024)
-        if max_size_mb and size_mb > max_size_mb:
-            raise ValueError(
-                f"File size {size_mb:.2f}MB exceeds max allowed {max_size_mb}MB"
+        # Stream file data (size enforced while reading)
+        spool, size, digest = await self._ingest(file, max_size_mb=max_size_mb)
+
+        with spool:
+            # Content-addressed key: identical bytes always map to the same object
+            file_id = digest
+            extension = file.filename.split(".")[-1]
+            object_name = (
+                f"{folder}/{file_id}.{extension}"
+                if folder
+                else f"{file_id}.{extension}"
             )
 
-        buffer = io.BytesIO(data)
-        file_id = str(uuid.uuid4())
-        extension = file.filename.split(".")[-1]
-        object_name = (
-            f"{folder}/{file_id}.{extension}" if folder else f"{file_id}.{extension}"
-        )
+            # Already stored -> skip the PUT (shared objects are reference-checked on
+            # delete, and the refreshed mtime keeps them while our row isn't committed)
+            await self._ensure_bucket()
+            if await self._refresh_if_exists(object_name):
+                return self._url(object_name), False
+
+            # Upload to S3 / MinIO, multipart above PART_SIZE
+            try:
+                await self._run(
+                    self.client.put_object,
+                    self.bucket,
+                    object_name,
+                    spool,
+                    length=size,
+                    part_size=PART_SIZE,
+                )
+            except S3Error as e:
+                raise RuntimeError(f"Failed to upload file: {e}")
+
+        return self._url(object_name), True
+
+    async def _put_bytes(self, object_name: str, data: bytes, content_type: str):
+        """Store `data` under `object_name` unless an object is already there."""
+        await self._ensure_bucket()
+        if await self._refresh_if_exists(object_name):
+            return
+        await self._write_bytes(object_name, data, content_type)
 
-        # Upload to S3 / MinIO
+    async def _write_bytes(self, object_name: str, data: bytes, content_type: str):
+        """Store `data` under `object_name`, replacing whatever is there."""
+        await self._ensure_bucket()
         try:
-            self.client.put_object(
+            await self._run(
+                self.client.put_object,
                 self.bucket,
                 object_name,
-                buffer,
+                io.BytesIO(data),
                 length=len(data),
-                part_size=5 * 1024 * 1024,
+                content_type=content_type,
             )
         except S3Error as e:
             raise RuntimeError(f"Failed to upload file: {e}")
 
+    async def _store_variants(self, url: str, result, extension: str = "webp") -> dict:
+        """
+        Store the downscaled variants and alternate formats of an uploaded image
+        next to it and return their srcset metadata, one source per width and type.
+        Keys are `{stem}.w{width}.{ext}` / `{stem}.{ext}`, so they follow the
+        original's content-addressed key and `_delete`.
+        """
+        stem = self._object_name(url).rsplit(".", 1)[0]
+
+        async def store(object_name: str, data: bytes, ext: str, rendered) -> dict:
+            await self._put_bytes(object_name, data, f"image/{ext}")
+            return {
+                "url": self._url(object_name),
+                "width": rendered.width,
+                "height": rendered.height,
+                "type": f"image/{ext}",
+            }
+
+        uploads = []
+        for rendered, key in [
+            *((v, f"{stem}.w{v.width}") for v in result.variants),
+            (result, stem),
+        ]:
+            # The original in the primary format is already stored by _upload
+            if rendered is not result:
+                uploads.append(
+                    store(f"{key}.{extension}", rendered.data, extension, rendered)
+                )
+            for format, data in rendered.alternates.items():
+                ext = format.lower()
+                uploads.append(store(f"{key}.{ext}", data, ext, rendered))
+
+        sources = await asyncio.gather(*uploads)
+        sources.append(
+            {
+                "url": url,
+                "width": result.width,
+                "height": result.height,
+                "type": f"image/{extension}",
+            }
+        )
+        return {
+            "width": result.width,
+            "height": result.height,
+            "placeholder": result.placeholder,
+            "sources": sorted(sources, key=lambda source: source["width"]),
+        }
+
+    def _presigned_post(
+        self,
+        object_name: str,
+        content_type: str,
+        max_size_mb: int,
+        expires_seconds: int,
+    ) -> tuple[str, dict]:
+        """
+        URL and form fields of a browser POST upload to `object_name`. Storage
+        itself rejects bodies over `max_size_mb` or of another content type.
+        """
+        policy = PostPolicy(
+            self.bucket,
+            datetime.now(timezone.utc) + timedelta(seconds=expires_seconds),
+        )
+        policy.add_equals_condition("key", object_name)
+        policy.add_equals_condition("Content-Type", content_type)
+        policy.add_content_length_range_condition(1, max_size_mb * 1024 * 1024)
+        fields = presign_client.presigned_post_policy(policy)
+        fields.update({"key": object_name, "Content-Type": content_type})
+        scheme = "https" if settings.S3_SECURE else "http"
+        return f"{scheme}://{settings.S3_PUBLIC_ENDPOINT}/{self.bucket}", fields
+
+    async def _open_object(self, object_name: str, max_size_mb=None):
+        """
+        Download an object into a spooled temp file.
+        Objects over max_size_mb are rejected from their metadata, before any
+        byte is downloaded. Returns (spool, content_type); the caller closes the spool.
+        """
+        limit = max_size_mb * 1024 * 1024 if max_size_mb else None
+
+        def _download():
+            if limit:
+                size = self.client.stat_object(self.bucket, object_name).size
+                if size > limit:
+                    raise ValueError(
+                        f"File size {size / (1024 * 1024):.2f}MB exceeds max allowed {max_size_mb}MB"
+                    )
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+            response = self.client.get_object(self.bucket, object_name)
+            try:
+                size = 0
+                for chunk in response.stream(CHUNK_SIZE):
+                    size += len(chunk)
+                    # Replaced after the stat: still never spool past the limit
+                    if limit and size > limit:
+                        raise ValueError(
+                            f"File size exceeds max allowed {max_size_mb}MB"
+                        )
+                    spool.write(chunk)
+                content_type = response.headers.get("Content-Type")
+            except BaseException:
+                spool.close()
+                raise
+            finally:
+                response.close()
+                response.release_conn()
+            spool.seek(0)
+            return spool, content_type
+
+        try:
+            return await self._run(_download)
+        except S3Error as e:
+            raise RuntimeError(f"Failed to download object: {e}")
+
+    async def _stream_object(self, object_name: str):
+        """
+        Yield an object's bytes chunk by chunk, without buffering it.
+        The connection is released when the generator finishes or is closed.
+        """
+        try:
+            response = await self._run(self.client.get_object, self.bucket, object_name)
+        except S3Error as e:
+            raise RuntimeError(f"Failed to download object: {e}")
+
+        try:
+            chunks = response.stream(CHUNK_SIZE)
+            while chunk := await self._run(next, chunks, None):
+                yield chunk
+        finally:
+            response.close()
+            response.release_conn()
+
+    async def _remove_object(self, object_name: str):
+        try:
+            await self._run(self.client.remove_object, self.bucket, object_name)
+        except S3Error as e:
+            print(f"Failed to delete {object_name}: {e}")
+
+    async def _refresh_if_exists(self, object_name: str) -> bool:
+        """
+        Whether `object_name` is stored. Deletes skip objects younger than
+        MEDIA_GC_GRACE_HOURS, so a stored object older than REFRESH_AFTER is
+        copied onto itself (headers and user metadata kept) to bump its
+        last-modified time: a deduplicated upload can't lose its object before
+        the row referencing it commits.
+        """
+
+        def _refresh():
+            try:
+                stat = self.client.stat_object(self.bucket, object_name)
+            except S3Error:
+                return False
+            if datetime.now(timezone.utc) - stat.last_modified < REFRESH_AFTER:
+                return True
+            self.client.copy_object(
+                self.bucket,
+                object_name,
+                CopySource(self.bucket, object_name),
+                metadata={
+                    key: value
+                    for key, value in stat.metadata.items()
+                    if key.lower() in KEPT_HEADERS
+                    or key.lower().startswith("x-amz-meta-")
+                },
+                metadata_directive=REPLACE,
+            )
+            return True
+
+        try:
+            return await self._run(_refresh)
+        except S3Error as e:
+            raise RuntimeError(f"Failed to refresh stored object: {e}")
+
+    async def _stat(self, object_name: str):
+        """The object's metadata (size, last_modified, ...), None when it's missing."""
+        try:
+            return await self._run(self.client.stat_object, self.bucket, object_name)
+        except S3Error:
+            return None
+
+    async def _last_modified(self, object_name: str) -> datetime | None:
+        stat = await self._stat(object_name)
+        return stat.last_modified if stat else None
+
+    async def _last_modified_many(self, object_names) -> dict[str, datetime | None]:
+        """`_last_modified` of every key, with S3_MAX_CONCURRENCY stats in flight."""
+        names = list(dict.fromkeys(object_names))
+        semaphore = asyncio.Semaphore(settings.S3_MAX_CONCURRENCY)
+
+        async def stat(name: str) -> datetime | None:
+            async with semaphore:
+                return await self._last_modified(name)
+
+        return dict(zip(names, await asyncio.gather(*(stat(name) for name in names))))
+
+    def _url(self, object_name: str) -> str:
         # Return presigned URL (works for local MinIO or AWS S3)
         try:
             url = f"http://localhost:9000/{self.bucket}/{object_name}"
@@ -74,7 +449,7 @@ class S3Base:
 
         return url
 
-    async def _delete(self, file_url: str):
+    def _object_name(self, file_url: str) -> str | None:
         parsed = urlparse(file_url)
         object_name = None
 
@@ -87,36 +462,112 @@ class S3Base:
             if len(path_parts) == 2 and path_parts[0] == self.bucket:
                 object_name = path_parts[1]
 
-        if object_name:
-            try:
-                self.client.remove_object(self.bucket, object_name)
-            except S3Error as e:
-                print(f"Failed to delete {object_name}: {e}")
-        else:
-            print(f"Cannot determine object key from URL: {file_url}")
+        return object_name
 
-    async def _copy(self, file_url: str, folder: str = "") -> str:
-        """
-        Copy an existing object in S3 / MinIO by downloading + re-uploading.
-        Returns a new URL.
-        """
-        parsed = urlparse(file_url)
-        object_name = parsed.path.lstrip("/").split("/", 1)[-1]
+    async def _list_objects(self, prefix: str) -> list:
+        """All objects under `prefix` (recursive), with their size and last_modified."""
+
+        def _list():
+            return list(
+                self.client.list_objects(self.bucket, prefix=prefix, recursive=True)
+            )
+
+        return await self._run(_list)
+
+    async def _derived_objects(self, object_name: str) -> list[str]:
+        """Keys stored alongside `object_name` as `{stem}.*` (e.g. image variants)."""
+        stem = object_name.rsplit(".", 1)[0]
+
+        def _list():
+            return [
+                obj.object_name
+                for obj in self.client.list_objects(self.bucket, prefix=f"{stem}.")
+                if obj.object_name != object_name
+            ]
 
-        # Download the object
         try:
-            response = self.client.get_object(self.bucket, object_name)
-            data = response.read()
-            response.close()
-            response.release_conn()
+            return await self._run(_list)
         except S3Error as e:
-            raise RuntimeError(f"Failed to download object for copy: {e}")
+            print(f"Failed to list derived objects of {object_name}: {e}")
+            return []
+
+    async def _delete_many(self, object_names) -> DeleteResult:
+        """
+        Remove keys with multi-object deletes of up to DELETE_BATCH_SIZE keys.
+        Keys failing inside a batch (or whole failed batches) are retried one
+        by one; what still fails is logged and reported in the result.
+        """
+        names = list(dict.fromkeys(object_names))
+        result = DeleteResult()
+        retry: list[str] = []
+
+        def _remove_batch(batch: list[str]) -> list:
+            # remove_objects is lazy, errors only surface while it is consumed
+            return list(
+                self.client.remove_objects(
+                    self.bucket, [DeleteObject(name) for name in batch]
+                )
+            )
+
+        for start in range(0, len(names), DELETE_BATCH_SIZE):
+            batch = names[start : start + DELETE_BATCH_SIZE]
+            try:
+                errors = await self._run(_remove_batch, batch)
+            except Exception as e:
+                print(f"Batch delete of {len(batch)} keys failed: {e}")
+                retry.extend(batch)
+                continue
+            failed = {error.name for error in errors}
+            result.deleted.extend(name for name in batch if name not in failed)
+            retry.extend(name for name in batch if name in failed)
 
-        # Wrap in UploadFile-like object
-        buffer = io.BytesIO(data)
-        buffer.seek(0)
-        filename = f"{uuid.uuid4()}.{object_name.split('.')[-1]}"
-        upload_file = UploadFile(filename=filename, file=buffer)
+        async def _retry(name: str):
+            for attempt in range(1, DELETE_RETRIES + 1):
+                try:
+                    await self._run(self.client.remove_object, self.bucket, name)
+                except Exception as e:
+                    if attempt == DELETE_RETRIES:
+                        result.failed.append(
+                            {
+                                "key": name,
+                                "code": getattr(e, "code", type(e).__name__),
+                                "message": str(getattr(e, "message", None) or e),
+                                "attempts": attempt,
+                            }
+                        )
+                        return
+                    await asyncio.sleep(0.2 * 2**attempt)
+                else:
+                    result.deleted.append(name)
+                    return
 
-        # Re-upload and return new URL
-        return await self._upload(upload_file, folder=folder)
+        await asyncio.gather(*(_retry(name) for name in retry))
+
+        for failure in result.failed:
+            print(
+                json.dumps(
+                    {"event": "s3_delete_failed", "bucket": self.bucket, **failure}
+                )
+            )
+        return result
+
+    async def _delete_urls(self, file_urls) -> DeleteResult:
+        """Delete the objects behind `file_urls` with their variants/renditions."""
+        object_names = []
+        for file_url in file_urls:
+            object_name = self._object_name(file_url)
+            if object_name:
+                object_names.append(object_name)
+            else:
+                print(f"Cannot determine object key from URL: {file_url}")
+
+        # Variants are only ever referenced through their original
+        derived = await asyncio.gather(
+            *(self._derived_objects(name) for name in object_names)
+        )
+        return await self._delete_many(
+            [*object_names, *(name for names in derived for name in names)]
+        )
+
+    async def _delete(self, file_url: str):
+        await self._delete_urls([file_url])
@@ -0,0 +1,167 @@
+import asyncio
+import base64
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from PIL import Image, ImageOps, features
+from app.core.settings import settings
+
+# Keep this module's imports light: pool workers are spawned and import it fresh.
+
+# Width of the inline low-quality placeholder shown while the real image loads
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+
+# Quality per format where the WebP scale would waste bytes; AVIF at 60 looks
+# like WebP at 80
+FORMAT_QUALITY = {"AVIF": 60}
+# AVIF encoder speed (0 slowest/smallest - 10 fastest), uploads wait on it
+AVIF_SPEED = 8
+
+# Formats stored next to the WebP original for clients that accept them
+ALTERNATE_FORMATS: tuple[str, ...] = (
+    ("AVIF",) if settings.IMAGE_AVIF and features.check("avif") else ()
+)
+
+
+@dataclass(frozen=True)
+class ImageSpec:
+    """A single image transform: decode `data`, resize to `size`, re-encode."""
+
+    data: bytes
+    size: tuple[int, int]
+    quality: int = 80
+    format: str = "WEBP"
+    # False keeps the aspect ratio inside `size`, True center-crops to fill it
+    crop: bool = False
+    # Extra downscaled copies, by width; widths not below the output's are skipped
+    variant_widths: tuple[int, ...] = ()
+    # Also render a tiny base64 data URI to show until the image loads
+    placeholder: bool = False
+    # Formats encoded in addition to `format`, for the output and every variant
+    alternate_formats: tuple[str, ...] = ()
+
+
+@dataclass
+class ImageResult:
+    data: bytes
+    width: int
+    height: int
+    variants: list["ImageResult"] = field(default_factory=list)
+    placeholder: str | None = None
+    # Same image in the spec's alternate formats, by format
+    alternates: dict[str, bytes] = field(default_factory=dict)
+
+
+def _encode(image: Image.Image, format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if format == "AVIF":
+        image.save(buffer, format=format, quality=quality, speed=AVIF_SPEED)
+    else:
+        image.save(buffer, format=format, quality=quality, optimize=True)
+    return buffer.getvalue()
+
+
+def _render(image: Image.Image, spec: ImageSpec) -> ImageResult:
+    return ImageResult(
+        data=_encode(image, spec.format, spec.quality),
+        width=image.width,
+        height=image.height,
+        alternates={
+            format: _encode(image, format, FORMAT_QUALITY.get(format, spec.quality))
+            for format in spec.alternate_formats
+        },
+    )
+
+
+def _transform(spec: ImageSpec) -> ImageResult:
+    image = Image.open(io.BytesIO(spec.data))
+
+    # Let libjpeg decode at the smallest 1/2, 1/4 or 1/8 scale that still covers
+    # the target, instead of decoding full resolution and throwing most of it away
+    if image.format == "JPEG":
+        image.draft("RGB", spec.size)
+
+    if spec.crop:
+        image = ImageOps.fit(image, spec.size, Image.Resampling.LANCZOS)
+    else:
+        image.thumbnail(spec.size, Image.Resampling.LANCZOS)
+
+    # Convert to RGB for JPEG/WebP
+    if image.mode in ("RGBA", "P"):
+        image = image.convert("RGB")
+
+    result = _render(image, spec)
+
+    # Variants are scaled from the already decoded image, never re-decoded
+    for width in sorted(spec.variant_widths):
+        if width >= image.width:
+            continue
+        variant = image.copy()
+        variant.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        result.variants.append(_render(variant, spec))
+
+    if spec.placeholder:
+        tiny = image.copy()
+        tiny.thumbnail((PLACEHOLDER_WIDTH, image.height), Image.Resampling.BILINEAR)
+        encoded = base64.b64encode(_encode(tiny, "WEBP", PLACEHOLDER_QUALITY))
+        result.placeholder = f"data:image/webp;base64,{encoded.decode()}"
+
+    return result
+
+
+class ImageEngine:
+    """
+    Runs image transforms off the event loop on a bounded process pool.
+    Pillow holds the GIL for most of a resize/encode, so threads don't scale;
+    at most `max_pending` transforms are queued, further callers wait their turn.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+
+    def _pool(self) -> ProcessPoolExecutor | None:
+        # Daemonic processes can't start their own pool. Celery's billiard
+        # children aren't seen as daemonic here, its workers call use_threads()
+        if self.workers <= 0 or multiprocessing.current_process().daemon:
+            return None
+        if self._executor is None:
+            # spawn: the API process runs threads (S3 executor), forking them is unsafe
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def transform(self, spec: ImageSpec) -> ImageResult:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        async with self._slots:
+            pool = self._pool()
+            if pool is None:
+                return await asyncio.to_thread(_transform, spec)
+            return await asyncio.get_running_loop().run_in_executor(
+                pool, _transform, spec
+            )
+
+    def use_threads(self):
+        """Transform on a thread of this process from now on, never on a pool."""
+        self.shutdown()
+        self.workers = 0
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+image_engine = ImageEngine(settings.IMAGE_WORKERS, settings.IMAGE_MAX_PENDING)
+
+
+async def transform(spec: ImageSpec) -> ImageResult:
+    return await image_engine.transform(spec)
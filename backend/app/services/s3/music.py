@@ -1,8 +1,13 @@
-import subprocess
-import tempfile
+import asyncio
 import os
+import re
+import tempfile
+import time
+from collections import deque
+from dataclasses import dataclass
 from fastapi import UploadFile
-from .base import S3Base
+from starlette.datastructures import Headers
+from .base import S3Base, CHUNK_SIZE, SPOOL_MAX_MEMORY
 
 # Allowed input audio formats
 ALLOWED_AUDIO_TYPES = {
@@ -11,75 +16,238 @@ ALLOWED_AUDIO_TYPES = {
     "audio/ogg",  # .ogg
 }
 
-# Accept up to 1MB raw upload
+# Raw upload limit, enforced while the upload is streamed in
+MAX_AUDIO_UPLOAD_SIZE_MB = 20
+
+# Accept up to 1MB converted MP3
 MAX_AUDIO_SIZE_MB = 1
 
+# Progress callbacks are invoked at most this often while ffmpeg runs
+PROGRESS_INTERVAL_SECONDS = 1
+
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+# -progress reports the output position in microseconds (out_time_ms is too, despite its name)
+OUT_TIME_RE = re.compile(r"^out_time_(?:us|ms)=(\d+)$")
+# Integrated loudness from the ebur128 filter summary
+LOUDNESS_RE = re.compile(r"^I:\s+(-?\d+(?:\.\d+)?) LUFS$")
+
+# Loudness every track is normalised to by the player, via the stored gain
+TARGET_LOUDNESS_LUFS = -16.0
+MAX_GAIN_DB = 12.0
+
+
+@dataclass(frozen=True)
+class AudioRendition:
+    extension: str
+    content_type: str
+    bitrate: str
+    sample_rate: str
+    # ffmpeg output options (codec, bitrate, container)
+    args: tuple[str, ...]
+
+
+# Fallback every browser plays, stored as background_audio
+MP3_RENDITION = AudioRendition(
+    extension="mp3",
+    content_type="audio/mpeg",
+    bitrate="96k",
+    sample_rate="44100",
+    args=("-c:a", "libmp3lame", "-b:a", "96k", "-f", "mp3"),
+)
+# Half the bytes for the same perceived quality, for clients that support it
+OPUS_RENDITION = AudioRendition(
+    extension="opus",
+    content_type="audio/ogg; codecs=opus",
+    bitrate="48k",
+    sample_rate="48000",  # Opus only runs at 48kHz (and fractions of it)
+    args=("-c:a", "libopus", "-b:a", "48k", "-vbr", "on", "-f", "ogg"),
+)
+
+
+@dataclass
+class StoredAudio:
+    """Uploaded audio (the MP3 URL) and its renditions, duration and gain."""
+
+    url: str
+    meta: dict
+
 
 class MusicService(S3Base):
-    async def _convert_to_mp3(self, file: UploadFile, bitrate="96k") -> str:
+    async def _transcode(
+        self, source, rendition: AudioRendition, measure=False, on_progress=None
+    ):
         """
-        Convert input file to compressed MP3 using ffmpeg.
-        Returns path to converted file.
+        Transcode the raw audio in `source` (a binary file object) with an async
+        ffmpeg subprocess; input and output are piped, nothing hits disk beyond
+        the returned spooled temp file (rewound, the caller closes it).
+        `on_progress(fraction)` is awaited as ffmpeg advances, when the input
+        duration is known. Returns (spool, stats) where stats holds the input
+        `duration` and, with `measure`, its integrated `loudness` in LUFS.
         """
-        # Save input temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".input") as tmp_in:
-            data = await file.read()
-            tmp_in.write(data)
-            input_path = tmp_in.name
-
-        output_path = input_path + ".mp3"
-
-        # Run ffmpeg compression → MP3 at 96 kbps
-        subprocess.run(
-            [
-                "ffmpeg",
-                "-y",
-                "-i",
-                input_path,
-                "-vn",  # no video
-                "-ar",
-                "44100",  # resample to 44.1kHz
-                "-ac",
-                "2",  # stereo
-                "-b:a",
-                bitrate,  # bitrate (controls size)
-                output_path,
-            ],
-            check=True,
+        # Loudness is measured on the way through; the frame log stays out of stderr
+        filters = ("-af", "ebur128=framelog=verbose") if measure else ()
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-progress",
+            "pipe:2",  # key=value progress lines on stderr
+            "-i",
+            "pipe:0",
+            "-vn",  # no video
+            *filters,
+            "-ar",
+            rendition.sample_rate,
+            "-ac",
+            "2",  # stereo
+            *rendition.args,
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
         )
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+        stats = {"duration": None, "loudness": None}
+        log = deque(maxlen=10)
+
+        # The spools are on disk past SPOOL_MAX_MEMORY: their I/O runs on a thread
+        async def feed():
+            try:
+                while chunk := await asyncio.to_thread(source.read, CHUNK_SIZE):
+                    process.stdin.write(chunk)
+                    await process.stdin.drain()
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # ffmpeg stopped reading, its exit code says why
+            finally:
+                process.stdin.close()
 
-        os.remove(input_path)  # cleanup input
-        return output_path
+        async def collect():
+            while chunk := await process.stdout.read(CHUNK_SIZE):
+                await asyncio.to_thread(output.write, chunk)
 
-    async def upload_music(self, file: UploadFile) -> str:
+        async def watch():
+            reported_at = 0.0
+            async for raw in process.stderr:
+                line = raw.decode(errors="replace").strip()
+                duration = stats["duration"]
+                if duration is None and (match := DURATION_RE.search(line)):
+                    hours, minutes, seconds = match.groups()
+                    stats["duration"] = (
+                        int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    )
+                elif match := OUT_TIME_RE.match(line):
+                    now = time.monotonic()
+                    if (
+                        on_progress
+                        and duration
+                        and now - reported_at >= PROGRESS_INTERVAL_SECONDS
+                    ):
+                        reported_at = now
+                        position = int(match.group(1)) / 1_000_000
+                        await on_progress(min(position / duration, 1.0))
+                elif match := LOUDNESS_RE.match(line):
+                    stats["loudness"] = float(match.group(1))
+                elif "=" not in line:
+                    log.append(line)
+
+        try:
+            await asyncio.gather(feed(), collect(), watch())
+            await process.wait()
+        except BaseException:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            output.close()
+            raise
+
+        if process.returncode != 0:
+            output.close()
+            raise RuntimeError(
+                f"ffmpeg failed ({process.returncode}): {log[-1] if log else 'no output'}"
+            )
+
+        output.seek(0)
+        return output, stats
+
+    async def upload_music(self, file: UploadFile, on_progress=None) -> StoredAudio:
         if file.content_type not in ALLOWED_AUDIO_TYPES:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        # Convert & compress first
-        mp3_path = await self._convert_to_mp3(file, bitrate="96k")
+        # Stream the raw upload, rejecting oversized files before transcoding
+        spool, _, _ = await self._ingest(file, max_size_mb=MAX_AUDIO_UPLOAD_SIZE_MB)
+
+        def progress(offset: float):
+            # Two passes over the input, each is half of the job
+            if not on_progress:
+                return None
 
-        # Open as UploadFile compatible object
-        with open(mp3_path, "rb") as f:
-            # Create a temporary UploadFile-like object
-            class TempUploadFile:
-                def __init__(self, filename, file):
-                    self.filename = filename
-                    self.file = file
-                    self.content_type = "audio/mpeg"
+            async def report(fraction: float):
+                await on_progress(offset + fraction / 2)
 
-                async def read(self):
-                    return self.file.read()
+            return report
 
-            upload_file = TempUploadFile(os.path.basename(mp3_path), f)
+        # Convert & compress first: the MP3 pass also measures the loudness
+        with spool:
+            mp3, stats = await self._transcode(
+                spool, MP3_RENDITION, measure=True, on_progress=progress(0)
+            )
+            try:
+                spool.seek(0)
+                opus, _ = await self._transcode(
+                    spool, OPUS_RENDITION, on_progress=progress(0.5)
+                )
+            except BaseException:
+                mp3.close()
+                raise
+
+        with mp3:
+            upload_file = UploadFile(
+                file=mp3,
+                filename=os.path.splitext(file.filename or "audio")[0] + ".mp3",
+                headers=Headers({"content-type": MP3_RENDITION.content_type}),
+            )
             url = await self._upload(
                 file=upload_file,
                 folder="music",
-                allowed_types={"audio/mpeg"},
+                allowed_types={MP3_RENDITION.content_type},
                 max_size_mb=MAX_AUDIO_SIZE_MB,
             )
 
-        os.remove(mp3_path)
-        return url
+        # Renditions share the MP3's content-addressed key, see S3Base._delete
+        stem = self._object_name(url).rsplit(".", 1)[0]
+        opus_name = f"{stem}.{OPUS_RENDITION.extension}"
+        with opus:
+            await self._put_bytes(opus_name, opus.read(), OPUS_RENDITION.content_type)
+
+        gain = None
+        if stats["loudness"] is not None:
+            gain = TARGET_LOUDNESS_LUFS - stats["loudness"]
+            gain = round(max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain)), 2)
+
+        if on_progress:
+            await on_progress(1.0)
+
+        return StoredAudio(
+            url=url,
+            meta={
+                "duration": round(stats["duration"], 2) if stats["duration"] else None,
+                "loudness": stats["loudness"],
+                "gain_db": gain,
+                # Cheapest first, the client plays the first type it supports
+                "renditions": [
+                    {
+                        "url": self._url(opus_name),
+                        "type": OPUS_RENDITION.content_type,
+                        "bitrate": OPUS_RENDITION.bitrate,
+                    },
+                    {
+                        "url": url,
+                        "type": MP3_RENDITION.content_type,
+                        "bitrate": MP3_RENDITION.bitrate,
+                    },
+                ],
+            },
+        )
 
     async def delete_music(self, file_url: str):
         """Delete audio from S3 by URL."""
@@ -1,12 +1,13 @@
 # app/services/s3/presentation_image.py
 from app.services.s3.base import S3Base
 from fastapi import UploadFile
-from PIL import Image
+from app.services.s3.image_engine import ImageSpec, transform
 import io
 import os
 
 class PresentationImageService(S3Base):
     ALLOWED_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+    MAX_UPLOAD_SIZE_MB = 20
     MAX_SIZE_MB = 1
     OPTIMIZE_QUALITY = 80
     TARGET_SIZE = (800, 600)
@@ -15,26 +16,28 @@ class PresentationImageService(S3Base):
         if file.content_type not in self.ALLOWED_TYPES:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        image = Image.open(file.file)
-
-        # Resize maintaining aspect ratio
-        image.thumbnail(self.TARGET_SIZE, Image.Resampling.LANCZOS)
-
-        # Convert to RGB
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Save to buffer as WebP
-        buffer = io.BytesIO()
+        # Stream the raw upload, rejecting oversized files before decoding
+        spool, _, _ = await self._ingest(file, max_size_mb=self.MAX_UPLOAD_SIZE_MB)
+        with spool:
+            data = spool.read()
+
+        # Resize to TARGET_SIZE (maintaining aspect ratio)
+        # Decoding and WebP encoding run on the image engine process pool
+        result = await transform(
+            ImageSpec(
+                data=data,
+                size=self.TARGET_SIZE,
+                quality=self.OPTIMIZE_QUALITY,
+            )
+        )
+        buffer = io.BytesIO(result.data)
         webp_filename = os.path.splitext(file.filename)[0] + ".webp"
-        image.save(buffer, format="WEBP", quality=self.OPTIMIZE_QUALITY, optimize=True)
 
         # Check size
-        size_mb = buffer.tell() / (1024 * 1024)
+        size_mb = len(result.data) / (1024 * 1024)
         if size_mb > self.MAX_SIZE_MB:
             raise ValueError(f"File too large ({size_mb:.2f} MB), max {self.MAX_SIZE_MB} MB")
 
-        buffer.seek(0)
         optimized_file = UploadFile(filename=webp_filename, file=buffer)
 
         # Upload using S3Base
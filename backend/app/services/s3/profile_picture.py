@@ -1,12 +1,13 @@
 from app.services.s3.base import S3Base
 from fastapi import UploadFile
-from PIL import Image, ImageOps
+from app.services.s3.image_engine import ImageSpec, transform
 import io
 import os
 
 
 class ProfilePictureService(S3Base):
     ALLOWED_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+    MAX_UPLOAD_SIZE_MB = 10
     MAX_SIZE_KB = 500
     TARGET_SIZE = (300, 300)  # Resize/crop to 300x300
 
@@ -16,28 +17,31 @@ class ProfilePictureService(S3Base):
         if file.content_type not in self.ALLOWED_TYPES:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        image = Image.open(file.file)
-
-        # Crop & resize to TARGET_SIZE, keeping the center
-        image = ImageOps.fit(image, self.TARGET_SIZE, Image.Resampling.LANCZOS)
-
-        # Convert to RGB for JPEG/WebP
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Save as WebP
-        buffer = io.BytesIO()
+        # Stream the raw upload, rejecting oversized files before decoding
+        spool, _, _ = await self._ingest(file, max_size_mb=self.MAX_UPLOAD_SIZE_MB)
+        with spool:
+            data = spool.read()
+
+        # Crop & resize to TARGET_SIZE keeping the center
+        # Decoding and WebP encoding run on the image engine process pool
+        result = await transform(
+            ImageSpec(
+                data=data,
+                size=self.TARGET_SIZE,
+                quality=70,
+                crop=True,
+            )
+        )
+        buffer = io.BytesIO(result.data)
         webp_filename = os.path.splitext(file.filename)[0] + ".webp"
-        image.save(buffer, format="WEBP", quality=70, optimize=True)
 
         # Check file size
-        size_kb = buffer.tell() / 1024
+        size_kb = len(result.data) / 1024
         if size_kb > self.MAX_SIZE_KB:
             raise ValueError(
                 f"File size {size_kb:.2f} KB exceeds max allowed {self.MAX_SIZE_KB} KB"
             )
 
-        buffer.seek(0)
         optimized_file = UploadFile(filename=webp_filename, file=buffer)
 
         # Upload to S3/MinIO
@@ -1,47 +1,100 @@
-from app.services.s3.base import S3Base
+import asyncio
+from app.services.s3.base import S3Base, StoredImage
 from fastapi import UploadFile
-from PIL import Image
+from app.services.s3.image_engine import ALTERNATE_FORMATS, ImageSpec, transform
 import io
 import os
 
 
+class SlideUploadError(ValueError):
+    """
+    A slide of a batch failed; `uploaded_urls` were already stored by the others,
+    `created_urls` are those of them this batch wrote (see discard_uploads).
+    """
+
+    def __init__(self, message: str, uploaded_urls: list[str], created_urls=()):
+        super().__init__(message)
+        self.uploaded_urls = uploaded_urls
+        self.created_urls = list(created_urls)
+
+
 class SlideService(S3Base):
     ALLOWED_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+    MAX_UPLOAD_SIZE_MB = 20
     MAX_SIZE_MB = 7
     OPTIMIZE_QUALITY = 80
     TARGET_SIZE = (1920, 1080)
+    # Smaller copies for responsive srcsets, the original covers TARGET_SIZE
+    VARIANT_WIDTHS = (480, 960)
+    # Slides of one request processed at the same time
+    UPLOAD_CONCURRENCY = 5
 
-    async def upload_slide(self, file: UploadFile, folder="slides") -> str:
+    async def upload_slide(self, file: UploadFile, folder="slides") -> StoredImage:
         if file.content_type not in self.ALLOWED_TYPES:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        image = Image.open(file.file)
+        # Stream the raw upload, rejecting oversized files before decoding
+        spool, _, _ = await self._ingest(file, max_size_mb=self.MAX_UPLOAD_SIZE_MB)
+        with spool:
+            data = spool.read()
 
         # Resize to TARGET_SIZE (maintaining aspect ratio)
-        image.thumbnail(self.TARGET_SIZE, Image.Resampling.LANCZOS)
-
-        # Convert to RGB for JPEG/WebP
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Save as WebP to buffer
-        buffer = io.BytesIO()
+        # Decoding and WebP encoding run on the image engine process pool
+        result = await transform(
+            ImageSpec(
+                data=data,
+                size=self.TARGET_SIZE,
+                quality=self.OPTIMIZE_QUALITY,
+                variant_widths=self.VARIANT_WIDTHS,
+                placeholder=True,
+                alternate_formats=ALTERNATE_FORMATS,
+            )
+        )
+        buffer = io.BytesIO(result.data)
         webp_filename = os.path.splitext(file.filename)[0] + ".webp"
-        image.save(buffer, format="WEBP", quality=self.OPTIMIZE_QUALITY, optimize=True)
 
         # Check size
-        size_mb = buffer.tell() / (1024 * 1024)
+        size_mb = len(result.data) / (1024 * 1024)
         if size_mb > self.MAX_SIZE_MB:
             raise ValueError(
                 f"File size {size_mb:.2f} MB exceeds max allowed {self.MAX_SIZE_MB} MB"
             )
 
-        buffer.seek(0)
         optimized_file = UploadFile(filename=webp_filename, file=buffer)
 
         # Upload to S3/MinIO using S3Base
-        url = await self._upload(optimized_file, folder)
-        return url
+        url, created = await self._store_upload(optimized_file, folder)
+        variants = await self._store_variants(url, result)
+        return StoredImage(url=url, variants=variants, created=created)
+
+    async def upload_slides(
+        self, files: list[UploadFile], folder="slides", concurrency: int | None = None
+    ) -> list[StoredImage]:
+        """
+        Upload a batch of slides concurrently, returning them in the order of `files`.
+        Either every slide is stored or SlideUploadError is raised once all of them
+        have finished, carrying the URLs that did get stored so the caller can
+        release them.
+        """
+        semaphore = asyncio.Semaphore(concurrency or self.UPLOAD_CONCURRENCY)
+
+        async def upload(file: UploadFile) -> StoredImage:
+            async with semaphore:
+                return await self.upload_slide(file, folder)
+
+        results = await asyncio.gather(
+            *(upload(file) for file in files), return_exceptions=True
+        )
+
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            stored = [r for r in results if isinstance(r, StoredImage)]
+            raise SlideUploadError(
+                str(errors[0]),
+                [s.url for s in stored],
+                [s.url for s in stored if s.created],
+            )
+        return results
 
     async def delete_slide(self, file_url: str):
         await self._delete(file_url)
@@ -0,0 +1,111 @@
+import os
+import uuid
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+from minio.error import S3Error
+from app.core.settings import settings
+from app.services.s3.base import S3Base, PART_SIZE
+from app.services.s3.slide import SlideService
+from app.services.s3.wallpaper import WallpaperService
+from app.services.s3.music import ALLOWED_AUDIO_TYPES, MAX_AUDIO_UPLOAD_SIZE_MB
+
+STAGING_PREFIX = "staging"
+
+# Raw files the browser may upload directly, per kind of invitation media
+STAGED_UPLOAD_TYPES = {
+    "wallpaper": set(WallpaperService.ALLOWED_TYPES),
+    "slide": set(SlideService.ALLOWED_TYPES),
+    "audio": ALLOWED_AUDIO_TYPES,
+}
+
+# Largest raw file accepted per kind, enforced by storage and again by the worker
+STAGED_UPLOAD_MAX_SIZE_MB = {
+    "wallpaper": WallpaperService.MAX_UPLOAD_SIZE_MB,
+    "slide": SlideService.MAX_UPLOAD_SIZE_MB,
+    "audio": MAX_AUDIO_UPLOAD_SIZE_MB,
+}
+
+
+class StagingService(S3Base):
+    """
+    Raw uploads written by the browser through presigned POST policies.
+    Objects under staging/ are unprocessed; a worker converts them and removes them.
+    """
+
+    def staging_prefix(self, invitation_id: int, kind: str) -> str:
+        return f"{STAGING_PREFIX}/{invitation_id}/{kind}/"
+
+    def template_staging_prefix(self, kind: str) -> str:
+        return f"{STAGING_PREFIX}/templates/{kind}/"
+
+    async def create_upload(
+        self, invitation_id: int, kind: str, filename: str, content_type: str
+    ) -> dict:
+        allowed_types = STAGED_UPLOAD_TYPES.get(kind)
+        if allowed_types is None:
+            raise ValueError(f"Unknown upload kind {kind}")
+        if content_type not in allowed_types:
+            raise ValueError(f"File type {content_type} not allowed")
+
+        await self._ensure_bucket()
+        extension = os.path.splitext(filename)[1].lstrip(".").lower() or "bin"
+        object_name = (
+            f"{self.staging_prefix(invitation_id, kind)}{uuid.uuid4()}.{extension}"
+        )
+        upload_url, fields = self._presigned_post(
+            object_name,
+            content_type,
+            STAGED_UPLOAD_MAX_SIZE_MB[kind],
+            settings.S3_PRESIGN_EXPIRE_SECONDS,
+        )
+        return {
+            "upload_url": upload_url,
+            "fields": fields,
+            "object_name": object_name,
+            "expires_in": settings.S3_PRESIGN_EXPIRE_SECONDS,
+        }
+
+    async def stage_upload(
+        self, file: UploadFile, prefix: str, allowed_types, max_size_mb=None
+    ) -> str:
+        """
+        Store a raw upload received by the API under `prefix` so a worker can
+        process it later. Returns the staging object name.
+        """
+        if file.content_type not in allowed_types:
+            raise ValueError(f"File type {file.content_type} not allowed")
+
+        spool, size, _ = await self._ingest(file, max_size_mb=max_size_mb)
+        extension = os.path.splitext(file.filename or "")[1].lstrip(".").lower() or "bin"
+        object_name = f"{prefix}{uuid.uuid4()}.{extension}"
+
+        await self._ensure_bucket()
+        with spool:
+            try:
+                await self._run(
+                    self.client.put_object,
+                    self.bucket,
+                    object_name,
+                    spool,
+                    length=size,
+                    part_size=PART_SIZE,
+                    content_type=file.content_type,
+                )
+            except S3Error as e:
+                raise RuntimeError(f"Failed to upload file: {e}")
+        return object_name
+
+    async def open_upload(self, object_name: str, max_size_mb=None) -> UploadFile:
+        """
+        Fetch a staged object as an UploadFile the media services can process.
+        Objects over max_size_mb raise ValueError without being downloaded.
+        """
+        spool, content_type = await self._open_object(object_name, max_size_mb)
+        return UploadFile(
+            file=spool,
+            filename=os.path.basename(object_name),
+            headers=Headers({"content-type": content_type or ""}),
+        )
+
+    async def discard(self, object_name: str):
+        await self._remove_object(object_name)
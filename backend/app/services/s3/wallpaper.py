@@ -1,48 +1,57 @@
-from app.services.s3.base import S3Base
+from app.services.s3.base import S3Base, StoredImage
 from fastapi import UploadFile
-from PIL import Image
+from app.services.s3.image_engine import ALTERNATE_FORMATS, ImageSpec, transform
 import io
 import os
 
 
 class WallpaperService(S3Base):
     ALLOWED_TYPES = ["image/jpeg", "image/png", "image/jpg"]
+    MAX_UPLOAD_SIZE_MB = 20
     MAX_SIZE_MB = 1
     OPTIMIZE_QUALITY = 80
     TARGET_SIZE = (1920, 1080)
+    # Smaller copies for responsive srcsets, the original covers TARGET_SIZE
+    VARIANT_WIDTHS = (480, 960)
 
-    async def upload_wallpaper(self, file: UploadFile, folder="wallpapers") -> str:
+    async def upload_wallpaper(self, file: UploadFile, folder="wallpapers") -> StoredImage:
         if file.content_type not in self.ALLOWED_TYPES:
             raise ValueError(f"File type {file.content_type} not allowed")
 
-        image = Image.open(file.file)
-
-        # Resize maintaining aspect ratio
-        image.thumbnail(self.TARGET_SIZE, Image.Resampling.LANCZOS)
-
-        # Convert to RGB for JPEG/WebP
-        if image.mode in ("RGBA", "P"):
-            image = image.convert("RGB")
-
-        # Save as WebP to buffer
-        buffer = io.BytesIO()
+        # Stream the raw upload, rejecting oversized files before decoding
+        spool, _, _ = await self._ingest(file, max_size_mb=self.MAX_UPLOAD_SIZE_MB)
+        with spool:
+            data = spool.read()
+
+        # Resize to TARGET_SIZE (maintaining aspect ratio)
+        # Decoding and WebP encoding run on the image engine process pool
+        result = await transform(
+            ImageSpec(
+                data=data,
+                size=self.TARGET_SIZE,
+                quality=self.OPTIMIZE_QUALITY,
+                variant_widths=self.VARIANT_WIDTHS,
+                placeholder=True,
+                alternate_formats=ALTERNATE_FORMATS,
+            )
+        )
+        buffer = io.BytesIO(result.data)
         webp_filename = os.path.splitext(file.filename)[0] + ".webp"
-        image.save(buffer, format="WEBP", quality=self.OPTIMIZE_QUALITY, optimize=True)
 
         # Check size
-        size_mb = buffer.tell() / (1024 * 1024)
+        size_mb = len(result.data) / (1024 * 1024)
         print(size_mb)
         if size_mb > self.MAX_SIZE_MB:
             raise ValueError(
                 f"Размерът на файла {size_mb:.2f} MB надвишава максимално разрешените {self.MAX_SIZE_MB} MB"
             )
 
-        buffer.seek(0)
         optimized_file = UploadFile(filename=webp_filename, file=buffer)
 
         # Upload to S3 / MinIO using _upload from S3Base
-        url = await self._upload(optimized_file, folder)
-        return url
+        url, created = await self._store_upload(optimized_file, folder)
+        variants = await self._store_variants(url, result)
+        return StoredImage(url=url, variants=variants, created=created)
 
     async def delete_wallpaper(self, file_url: str):
         await self._delete(file_url)
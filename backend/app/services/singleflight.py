@@ -0,0 +1,126 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, TypeVar
+from app.core.redis_client import get_redis_client
+from app.core.settings import settings
+
+T = TypeVar("T")
+
+# One load per key at a time. Within a process, concurrent callers await the
+# leader's future; across pods, the leader holds `single_flight:{key}` (its
+# value is a per-flight token) and publishes the encoded result under
+# `single_flight:{key}:{token}`, which the other pods poll for. Only callers
+# that saw the lock held read that result, so it is never older than the flight.
+LOCK_KEY_PREFIX = "single_flight:"
+RESULT_TTL_SECONDS = 5
+POLL_INTERVAL_SECONDS = 0.05
+
+# KEYS: lock; ARGV: token
+RELEASE_IF_OWNER = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_flights: dict[str, asyncio.Future] = {}
+
+
+async def _await_other_pod(redis, lock_key: str, decode) -> tuple[bool, object]:
+    """Wait for the flight holding `lock_key`; (False, None) when we should load."""
+    deadline = time.monotonic() + settings.SINGLE_FLIGHT_WAIT_SECONDS
+    token = await redis.get(lock_key)
+    while token and time.monotonic() < deadline:
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+        raw = await redis.get(f"{lock_key}:{token}")
+        if raw is not None:
+            return True, decode(raw)
+        if await redis.get(lock_key) != token:
+            # Released without a result (the loader failed) or expired
+            break
+    return False, None
+
+
+async def _load_across_pods(
+    key: str,
+    load: Callable[[], Awaitable[T]],
+    encode: Callable[[T], str],
+    decode: Callable[[str], T],
+) -> T:
+    lock_key = f"{LOCK_KEY_PREFIX}{key}"
+    token = uuid.uuid4().hex
+    lock_ms = int(settings.SINGLE_FLIGHT_LOCK_SECONDS * 1000)
+    try:
+        redis = await get_redis_client()
+        acquired = await redis.set(lock_key, token, nx=True, px=lock_ms)
+        if not acquired:
+            shared, result = await _await_other_pod(redis, lock_key, decode)
+            if shared:
+                return result
+            acquired = await redis.set(lock_key, token, nx=True, px=lock_ms)
+    except Exception as e:
+        # Coordination is an optimisation, never a reason to fail the read
+        print(f"Single-flight lock for {key} failed: {e}")
+        return await load()
+
+    if not acquired:
+        return await load()
+
+    try:
+        result = await load()
+        try:
+            await redis.set(
+                f"{lock_key}:{token}", encode(result), ex=RESULT_TTL_SECONDS
+            )
+        except Exception as e:
+            print(f"Single-flight result for {key} not shared: {e}")
+        return result
+    finally:
+        try:
+            await redis.eval(RELEASE_IF_OWNER, 1, lock_key, token)
+        except Exception as e:
+            print(f"Single-flight unlock of {key} failed: {e}")
+
+
+async def single_flight(
+    key: str,
+    load: Callable[[], Awaitable[T]],
+    *,
+    encode: Callable[[T], str],
+    decode: Callable[[str], T],
+) -> T:
+    """
+    Run `load` once for all concurrent callers of `key`, in this process and
+    across pods, and give each of them its result. `encode`/`decode` carry the
+    result between pods; callers in this process share the same object, so it
+    must not be mutated. A loader's exception is raised to its waiters too.
+    """
+    flight = _flights.get(key)
+    if flight is not None:
+        try:
+            return await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            # The leader's request went away: load ourselves, unless it was us
+            if not flight.cancelled():
+                raise
+            return await single_flight(key, load, encode=encode, decode=decode)
+
+    flight = asyncio.get_running_loop().create_future()
+    _flights[key] = flight
+    try:
+        result = await _load_across_pods(key, load, encode, decode)
+    except asyncio.CancelledError:
+        flight.cancel()
+        raise
+    except BaseException as e:
+        flight.set_exception(e)
+        # Retrieved here so a flight without waiters doesn't log it again
+        flight.exception()
+        raise
+    else:
+        flight.set_result(result)
+        return result
+    finally:
+        if _flights.get(key) is flight:
+            del _flights[key]
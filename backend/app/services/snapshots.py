@@ -0,0 +1,99 @@
+from datetime import datetime, timezone
+from app.core.redis_client import get_redis_client
+from app.core.settings import settings
+from app.services.invitation_loader import InvitationDocument
+
+# Published (active) invitations, served to guests without touching Postgres.
+# `invitation_snapshot:{slug}` holds the document, `invitation_snapshot_version:{slug}`
+# is bumped by every invalidation: a snapshot is only stored if the version is
+# still the one read before loading it, so a slow (or replica-lagged) load can't
+# put back a document that was invalidated meanwhile.
+SNAPSHOT_KEY_PREFIX = "invitation_snapshot:"
+VERSION_KEY_PREFIX = "invitation_snapshot_version:"
+VERSION_TTL_SECONDS = 30 * 24 * 60 * 60
+
+# KEYS: snapshot, version; ARGV: expected version ("" when none), value, ttl
+STORE_IF_CURRENT = """
+local version = redis.call('GET', KEYS[2]) or ''
+if version ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'EX', ARGV[3])
+return 1
+"""
+
+
+def _keys(slug: str) -> tuple[str, str]:
+    return f"{SNAPSHOT_KEY_PREFIX}{slug}", f"{VERSION_KEY_PREFIX}{slug}"
+
+
+def _ttl(document: InvitationDocument) -> int:
+    ttl = settings.INVITATION_SNAPSHOT_TTL_SECONDS
+    if document.active_until:
+        # active_until is stored as naive UTC
+        until = document.active_until.replace(tzinfo=timezone.utc)
+        ttl = min(ttl, int((until - datetime.now(timezone.utc)).total_seconds()))
+    return ttl
+
+
+async def get_snapshot(slug: str) -> tuple[InvitationDocument | None, str]:
+    """The published snapshot of `slug` (or None) and the current version."""
+    redis = await get_redis_client()
+    raw, version = await redis.mget(*_keys(slug))
+    if not raw:
+        return None, version or ""
+    return InvitationDocument.from_json(raw), version or ""
+
+
+async def store_snapshot(document: InvitationDocument, version: str) -> bool:
+    """
+    Store a freshly loaded active invitation, unless it was invalidated since
+    `version` was read. Returns whether it was stored.
+    """
+    ttl = _ttl(document)
+    if not document.is_active or not document.slug or ttl <= 0:
+        return False
+    redis = await get_redis_client()
+    stored = await redis.eval(
+        STORE_IF_CURRENT, 2, *_keys(document.slug), version, document.to_json(), ttl
+    )
+    return bool(stored)
+
+
+async def _invalidate(slugs: set[str]):
+    redis = await get_redis_client()
+    async with redis.pipeline(transaction=False) as pipeline:
+        for slug in slugs:
+            snapshot_key, version_key = _keys(slug)
+            pipeline.delete(snapshot_key)
+            pipeline.incr(version_key)
+            pipeline.expire(version_key, VERSION_TTL_SECONDS)
+        await pipeline.execute()
+
+
+async def invalidate_snapshots(*slugs: str | None):
+    """
+    Drop the snapshots of `slugs` and fence off loads already in flight.
+    Call after the change has been committed; cache errors are only logged.
+    """
+    slugs = {slug for slug in slugs if slug}
+    if not slugs:
+        return
+    try:
+        await _invalidate(slugs)
+    except Exception as e:
+        print(f"Failed to invalidate snapshots {sorted(slugs)}: {e}")
+
+
+async def publish_snapshot(document: InvitationDocument, *stale_slugs: str | None):
+    """
+    After an owner's change: invalidate the invitation's snapshot (and the ones
+    under `stale_slugs`, e.g. its previous slug), then store the new document if
+    it is published. Cache errors never fail the write that triggered them.
+    """
+    try:
+        await _invalidate({slug for slug in (document.slug, *stale_slugs) if slug})
+        _, version = await get_snapshot(document.slug)
+        await store_snapshot(document, version)
+    except Exception as e:
+        print(f"Failed to refresh snapshot of invitation {document.id}: {e}")
@@ -0,0 +1,72 @@
+import os
+from datetime import datetime, timezone
+from types import SimpleNamespace
+import pytest
+from minio.error import S3Error
+
+# Settings are read on import: point the app at nothing real
+os.environ.setdefault("DATABASE_URL_WRITER", "postgresql+asyncpg://test@localhost/test")
+os.environ.setdefault("DATABASE_URL_READER", "postgresql+asyncpg://test@localhost/test")
+os.environ.setdefault("S3_BUCKET", "media")
+os.environ.setdefault("IMAGE_WORKERS", "0")
+
+
+class FakeMinio:
+    """In-memory stand-in for the MinIO client calls S3Base makes."""
+
+    def __init__(self):
+        self.objects: dict[str, SimpleNamespace] = {}
+
+    def _missing(self, bucket, name):
+        return S3Error(
+            "NoSuchKey", "Object does not exist", name, None, None, None, bucket, name
+        )
+
+    def bucket_exists(self, bucket):
+        return True
+
+    def put_object(self, bucket, name, data, length, content_type=None, **kwargs):
+        content_type = content_type or "application/octet-stream"
+        self.objects[name] = SimpleNamespace(
+            object_name=name,
+            data=data.read(length),
+            size=length,
+            content_type=content_type,
+            metadata={"Content-Type": content_type},
+            last_modified=datetime.now(timezone.utc),
+        )
+
+    def stat_object(self, bucket, name):
+        if name not in self.objects:
+            raise self._missing(bucket, name)
+        return self.objects[name]
+
+    def copy_object(self, bucket, name, source, metadata=None, **kwargs):
+        stored = self.stat_object(bucket, source.object_name)
+        self.objects[name] = SimpleNamespace(
+            **{
+                **vars(stored),
+                "object_name": name,
+                "last_modified": datetime.now(timezone.utc),
+            }
+        )
+
+    def list_objects(self, bucket, prefix="", recursive=False):
+        return [obj for name, obj in self.objects.items() if name.startswith(prefix)]
+
+    def remove_object(self, bucket, name):
+        self.objects.pop(name, None)
+
+    def remove_objects(self, bucket, delete_objects):
+        for delete in delete_objects:
+            self.objects.pop(delete._name, None)
+        return iter(())
+
+
+@pytest.fixture
+def storage(monkeypatch):
+    from app.services.s3 import base
+
+    client = FakeMinio()
+    monkeypatch.setattr(base, "minio_client", client)
+    return client
@@ -0,0 +1,32 @@
+import asyncio
+import io
+from celery.signals import worker_init
+from PIL import Image
+from app.services.s3.image_engine import ImageEngine, ImageSpec, image_engine
+
+
+def jpeg() -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300), "green").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def test_use_threads_never_starts_a_pool():
+    engine = ImageEngine(workers=2, max_pending=2)
+    engine.use_threads()
+
+    result = asyncio.run(engine.transform(ImageSpec(data=jpeg(), size=(200, 200))))
+
+    assert (result.width, result.height) == (200, 150)
+    assert engine._executor is None
+
+
+def test_celery_worker_transforms_on_a_thread(monkeypatch):
+    import app.celery_app  # noqa: F401 (connects the worker signals)
+
+    monkeypatch.setattr(image_engine, "workers", 2)
+    # Sent by the worker before its prefork pool starts
+    worker_init.send(sender=None)
+
+    assert image_engine._pool() is None
+    assert image_engine._executor is None
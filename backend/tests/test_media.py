@@ -0,0 +1,71 @@
+import asyncio
+import io
+import pytest
+from PIL import Image
+from starlette.datastructures import Headers, UploadFile
+from app.services import media
+from app.services.s3.slide import SlideService, SlideUploadError
+
+
+def png(color: str) -> UploadFile:
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), color).save(buffer, format="PNG")
+    buffer.seek(0)
+    return UploadFile(
+        buffer,
+        filename=f"{color}.png",
+        headers=Headers({"content-type": "image/png"}),
+    )
+
+
+def broken() -> UploadFile:
+    return UploadFile(
+        io.BytesIO(b"not an image"),
+        filename="broken.png",
+        headers=Headers({"content-type": "image/png"}),
+    )
+
+
+@pytest.fixture
+def unreferenced(monkeypatch):
+    async def referenced_urls(db, urls):
+        return set()
+
+    monkeypatch.setattr(media, "referenced_urls", referenced_urls)
+
+
+def test_failed_slide_batch_leaves_no_objects(storage, unreferenced):
+    async def run():
+        service = SlideService()
+        with pytest.raises(SlideUploadError) as failed:
+            await service.upload_slides([png("red"), png("blue"), broken()])
+        assert len(failed.value.created_urls) == 2
+        assert storage.objects
+
+        await media.discard_uploads(
+            None, failed.value.uploaded_urls, failed.value.created_urls
+        )
+
+    asyncio.run(run())
+    assert storage.objects == {}
+
+
+def test_failed_slide_batch_keeps_deduplicated_objects(storage, unreferenced):
+    async def run():
+        service = SlideService()
+        shared = await service.upload_slide(png("red"))
+        kept = set(storage.objects)
+
+        with pytest.raises(SlideUploadError) as failed:
+            await service.upload_slides([png("red"), png("blue"), broken()])
+        assert failed.value.created_urls != failed.value.uploaded_urls
+        assert shared.url not in failed.value.created_urls
+
+        await media.discard_uploads(
+            None, failed.value.uploaded_urls, failed.value.created_urls
+        )
+        return kept
+
+    kept = asyncio.run(run())
+    # Another request may be committing a row that shares the red slide
+    assert set(storage.objects) == kept